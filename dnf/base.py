@@ -26,18 +26,17 @@ from __future__ import unicode_literals
 from dnf.comps import CompsQuery
 from dnf.i18n import _, P_, ucd
 from dnf.util import first
-from dnf.yum import history
 from dnf.yum import misc
 from dnf.yum import rpmsack
 from functools import reduce
 import collections
 import datetime
 import dnf.callback
+import dnf.completion_cache
 import dnf.comps
 import dnf.conf
 import dnf.conf.read
 import dnf.crypto
-import dnf.drpm
 import dnf.exceptions
 import dnf.goal
 import dnf.history
@@ -64,6 +63,7 @@ import os
 import operator
 import re
 import rpm
+import threading
 import time
 
 logger = logging.getLogger("dnf")
@@ -92,6 +92,8 @@ class Base(object):
         self._plugins = dnf.plugin.Plugins()
         self._trans_success = False
         self._tempfile_persistor = None
+        self._priv_checksum_persistor = None
+        self._checksum_persistor_lock = threading.Lock()
         self._update_security_filters = {}
 
     def __enter__(self):
@@ -174,6 +176,10 @@ class Base(object):
         if self._tempfile_persistor:
             self._tempfile_persistor.save()
 
+        # Do not trigger the lazy creation:
+        if self._priv_checksum_persistor is not None:
+            self._priv_checksum_persistor.save()
+
     @property
     def comps(self):
         # :api
@@ -194,6 +200,15 @@ class Base(object):
         # :api
         self._repos = None
 
+    @property
+    def _checksum_persistor(self):
+        # first used by the threads verifying the downloaded packages
+        with self._checksum_persistor_lock:
+            if self._priv_checksum_persistor is None:
+                self._priv_checksum_persistor = \
+                    dnf.persistor.ChecksumPersistor(self.conf.cachedir)
+        return self._priv_checksum_persistor
+
     @property
     @dnf.util.lazyattr("_priv_rpmconn")
     def _rpmconn(self):
@@ -236,7 +251,11 @@ class Base(object):
         """Prepare the Sack and the Goal objects. """
         timer = dnf.logging.Timer('sack setup')
         self._sack = dnf.sack._build_sack(self)
-        lock = dnf.lock.build_metadata_lock(self.conf.cachedir, self.conf.exit_on_lock)
+        # only reading the cache, other readers can load their sacks meanwhile
+        shared = not load_available_repos or \
+            all(r._md_only_cached for r in self.repos.iter_enabled())
+        lock = dnf.lock.build_metadata_lock(self.conf.cachedir,
+                                            self.conf.exit_on_lock, shared)
         with lock:
             if load_system_repo is not False:
                 try:
@@ -248,8 +267,13 @@ class Base(object):
                 errors = []
                 mts = 0
                 age = time.time()
-                for r in self.repos.iter_enabled():
+                enabled = list(self.repos.iter_enabled())
+                sync_errors = dnf.repo._sync_repos(enabled,
+                                                   self.conf.metadata_sync_jobs)
+                for r in enabled:
                     try:
+                        if r.id in sync_errors:
+                            raise sync_errors[r.id]
                         self._add_repo_to_sack(r)
                         if r.metadata._timestamp > mts:
                             mts = r.metadata._timestamp
@@ -285,6 +309,32 @@ class Base(object):
         db_path = os.path.normpath(self.conf.persistdir + '/yumdb')
         return rpmsack.AdditionalPkgDB(db_path)
 
+    def _rpmdb_version(self, pkgs=None):
+        """Return the rpmdb version, reusing the persisted one if still valid.
+
+        The persisted version is keyed by the rpmdb files' stat data, the yumdb
+        generation and the number of installed packages, pkgs defaulting to
+        the installed packages of the sack.
+
+        """
+        if pkgs is None:
+            pkgs = self.sack.query().installed().run()
+        persistor = dnf.persistor.RpmdbVersionPersistor(self.conf.persistdir)
+        key = None
+        generation = self._yumdb.generation
+        if generation is not None:
+            key = [dnf.rpm._rpmdb_signature(self.conf.installroot),
+                   generation, len(pkgs)]
+            version = persistor.get(key)
+            if version is not None:
+                logger.debug('rpmdb version: cache hit: %s', version)
+                return version
+        version = str(dnf.sack._rpmdb_version(pkgs, self._yumdb))
+        logger.debug('rpmdb version: cache miss: %s', version)
+        if key is not None:
+            persistor.save(key, version)
+        return version
+
     def close(self):
         # :api
         """Close all potential handles and clean cache.
@@ -321,6 +371,8 @@ class Base(object):
         # Do not trigger the lazy creation:
         if self._history is not None:
             self.history.close()
+        if getattr(self, '_priv_yumdb', None) is not None:
+            self._yumdb.close()
         self._store_persistent_data()
         self._closeRpmDB()
 
@@ -420,6 +472,11 @@ class Base(object):
 
             logger.log(dnf.logging.DDEBUG,
                        'Adding group file from repository: %s', repo.id)
+            cache_fn = os.path.join(self.conf.cachedir,
+                                    repo.id + '-comps.json')
+            key = repo.metadata._comps_checksum
+            if self._comps._add_from_cache(cache_fn, key):
+                continue
             if repo._md_only_cached:
                 decompressed = misc.calculate_repo_gen_dest(comps_fn,
                                                             'groups.xml')
@@ -430,7 +487,7 @@ class Base(object):
                 decompressed = misc.repo_gen_decompress(comps_fn, 'groups.xml')
 
             try:
-                self._comps._add_from_xml_filename(decompressed)
+                self._comps._add_from_xml_filename(decompressed, cache_fn, key)
             except dnf.exceptions.CompsError as e:
                 msg = _('Failed to add groups file for repository: %s - %s')
                 logger.critical(msg, repo.id, e)
@@ -446,6 +503,7 @@ class Base(object):
         """auto create the history object that to access/append the transaction
            history information. """
         if self._history is None:
+            from dnf.yum import history
             db_path = self.conf.persistdir + "/history"
             releasever = self.conf.releasever
             self._history = history.YumHistory(db_path, self._yumdb,
@@ -705,7 +763,7 @@ class Base(object):
             using_pkgs_pats = list(self.conf.history_record_packages)
             installed_query = self.sack.query().installed()
             using_pkgs = installed_query.filter(name=using_pkgs_pats).run()
-            rpmdbv = self.sack._rpmdb_version(self._yumdb)
+            rpmdbv = self._rpmdb_version()
             lastdbv = self.history.last()
             if lastdbv is not None:
                 lastdbv = lastdbv.end_rpmdbversion
@@ -733,7 +791,10 @@ class Base(object):
                     onice = 0
 
         logger.log(dnf.logging.DDEBUG, 'RPM transaction start.')
-        errors = self._ts.run(cb.callback, '')
+        try:
+            errors = self._ts.run(cb.callback, '')
+        finally:
+            cb.close()
         logger.log(dnf.logging.DDEBUG, 'RPM transaction over.')
         # ts.run() exit codes are, hmm, "creative": None means all ok, empty
         # list means some errors happened in the transaction and non-empty
@@ -815,93 +876,106 @@ class Base(object):
 
         timer = dnf.logging.Timer('verify transaction')
         count = 0
-        # the rpmdb has changed by now. hawkey doesn't support dropping a repo
-        # yet we have to check what packages are in now: build a transient sack
-        # with only rpmdb in it. In the future when RPM Python bindings can
-        # tell us if a particular transaction element failed or not we can skip
-        # this completely.
-        rpmdb_sack = dnf.sack._rpmdb_sack(self)
-
-        for tsi in self._transaction:
-            rpo = tsi.installed
-            if rpo is None:
-                continue
-
-            installed = rpmdb_sack.query().installed()._nevra(
-                rpo.name, rpo.evr, rpo.arch)
-            if len(installed) < 1:
-                tsi.op_type = dnf.transaction.FAIL
-                logger.critical(_('%s was supposed to be installed'
-                                  ' but is not!'), rpo)
-                count = display_banner(rpo, count)
-                continue
-            po = installed[0]
-            count = display_banner(rpo, count)
-            yumdb_info = self._yumdb.get_package(po)
-            yumdb_info.from_repo = rpo.repoid
-
-            yumdb_info.reason = tsi._propagated_reason(self._yumdb,
-                                                      self.conf.installonlypkgs)
-            yumdb_info.releasever = self.conf.releasever
-            if hasattr(self, 'args') and self.args:
-                yumdb_info.command_line = ' '.join(self.args)
-            elif hasattr(self, 'cmds') and self.cmds:
-                yumdb_info.command_line = ' '.join(self.cmds)
-            csum = rpo.returnIdSum()
-            if csum is not None:
-                yumdb_info.checksum_type = str(csum[0])
-                yumdb_info.checksum_data = csum[1]
+        # the rpmdb has changed by now. Read the headers of just the affected
+        # package names from it in one go instead of loading it all into a
+        # transient sack. In the future when RPM Python bindings can tell us
+        # if a particular transaction element failed or not we can skip this
+        # completely.
+        names = [tsi.installed.name for tsi in self._transaction
+                 if tsi.installed is not None]
+        names.extend(pkg.name for pkg in self.transaction.remove_set)
+        rpmdb_pkgs = dict((pkg.pkgtup, pkg) for pkg in
+                          dnf.rpm._installed_headers(self._ts, names))
+
+        synced = []
+        # all the yumdb changes are written to its index at once
+        with self._yumdb.batch():
+            for tsi in self._transaction:
+                rpo = tsi.installed
+                if rpo is None:
+                    continue
 
-            if rpo._from_cmdline:
-                try:
-                    st = os.stat(rpo.localPkg())
-                    lp_ctime = str(int(st.st_ctime))
-                    lp_mtime = str(int(st.st_mtime))
-                    yumdb_info.from_repo_revision = lp_ctime
-                    yumdb_info.from_repo_timestamp = lp_mtime
-                except Exception:
-                    pass
-            elif hasattr(rpo.repo, 'repoXML'):
-                md = rpo.repo.repoXML
-                if md and md._revision is not None:
-                    yumdb_info.from_repo_revision = str(md._revision)
-                if md:
-                    yumdb_info.from_repo_timestamp = str(md._timestamp)
-
-            loginuid = misc.getloginuid()
-            if tsi.op_type in (dnf.transaction.DOWNGRADE,
-                               dnf.transaction.REINSTALL,
-                               dnf.transaction.UPGRADE):
-                opo = tsi.erased
-                opo_yumdb_info = self._yumdb.get_package(opo)
-                if 'installed_by' in opo_yumdb_info:
-                    yumdb_info.installed_by = opo_yumdb_info.installed_by
-                if loginuid is not None:
-                    yumdb_info.changed_by = str(loginuid)
-            elif loginuid is not None:
-                yumdb_info.installed_by = str(loginuid)
-
-            if self.conf.history_record:
-                self.history.sync_alldb(po)
-
-        just_installed = self.sack.query().\
-            filter(pkg=self.transaction.install_set)
-        for rpo in self.transaction.remove_set:
-            installed = rpmdb_sack.query().installed()._nevra(
-                rpo.name, rpo.evr, rpo.arch)
-            if len(installed) > 0:
-                if not len(just_installed.filter(arch=rpo.arch, name=rpo.name,
-                                                 evr=rpo.evr)):
-                    msg = _('%s was supposed to be removed but is not!')
-                    logger.critical(msg, rpo)
+                po = rpmdb_pkgs.get(rpo.pkgtup)
+                if po is None:
+                    tsi.op_type = dnf.transaction.FAIL
+                    logger.critical(_('%s was supposed to be installed'
+                                      ' but is not!'), rpo)
                     count = display_banner(rpo, count)
                     continue
-            else:
-                self._yumdb.get_package(rpo).clean()
-            count = display_banner(rpo, count)
+                count = display_banner(rpo, count)
+                yumdb_info = self._yumdb.get_package(po)
+                yumdb_info.from_repo = rpo.repoid
+
+                yumdb_info.reason = tsi._propagated_reason(
+                    self._yumdb, self.conf.installonlypkgs)
+                yumdb_info.releasever = self.conf.releasever
+                if hasattr(self, 'args') and self.args:
+                    yumdb_info.command_line = ' '.join(self.args)
+                elif hasattr(self, 'cmds') and self.cmds:
+                    yumdb_info.command_line = ' '.join(self.cmds)
+                csum = rpo.returnIdSum()
+                if csum is not None:
+                    yumdb_info.checksum_type = str(csum[0])
+                    yumdb_info.checksum_data = csum[1]
+
+                if rpo._from_cmdline:
+                    try:
+                        st = os.stat(rpo.localPkg())
+                        lp_ctime = str(int(st.st_ctime))
+                        lp_mtime = str(int(st.st_mtime))
+                        yumdb_info.from_repo_revision = lp_ctime
+                        yumdb_info.from_repo_timestamp = lp_mtime
+                    except Exception:
+                        pass
+                elif hasattr(rpo.repo, 'repoXML'):
+                    md = rpo.repo.repoXML
+                    if md and md._revision is not None:
+                        yumdb_info.from_repo_revision = str(md._revision)
+                    if md:
+                        yumdb_info.from_repo_timestamp = str(md._timestamp)
+
+                loginuid = misc.getloginuid()
+                if tsi.op_type in (dnf.transaction.DOWNGRADE,
+                                   dnf.transaction.REINSTALL,
+                                   dnf.transaction.UPGRADE):
+                    opo = tsi.erased
+                    opo_yumdb_info = self._yumdb.get_package(opo)
+                    if 'installed_by' in opo_yumdb_info:
+                        yumdb_info.installed_by = opo_yumdb_info.installed_by
+                    if loginuid is not None:
+                        yumdb_info.changed_by = str(loginuid)
+                elif loginuid is not None:
+                    yumdb_info.installed_by = str(loginuid)
+                synced.append(po)
+
+            just_installed = self.sack.query().\
+                filter(pkg=self.transaction.install_set)
+            for rpo in self.transaction.remove_set:
+                if rpo.pkgtup in rpmdb_pkgs:
+                    if not len(just_installed.filter(
+                            arch=rpo.arch, name=rpo.name, evr=rpo.evr)):
+                        msg = _('%s was supposed to be removed but is not!')
+                        logger.critical(msg, rpo)
+                        count = display_banner(rpo, count)
+                        continue
+                else:
+                    self._yumdb.get_package(rpo).clean()
+                count = display_banner(rpo, count)
+        if self.conf.history_record:
+            self.history.sync_alldb_many(synced)
+        # the rpmdb now holds the packages of the sack the transaction did not
+        # touch and the headers read above
+        touched = set(names)
+        pkgs = [pkg for pkg in self.sack.query().installed()
+                if pkg.name not in touched]
+        pkgs.extend(rpmdb_pkgs.values())
+        # the order the system repo lists them in, so the rpmdb version is the
+        # same as the one computed from the sack in the next run
+        pkgs.sort(key=lambda pkg: (pkg.name, pkg.rpmdbid))
         if self._record_history():
-            rpmdbv = rpmdb_sack._rpmdb_version(self._yumdb)
+            rpmdbv = self._rpmdb_version(pkgs)
             self.history.end(rpmdbv, 0)
+        dnf.completion_cache.update_installed(self, pkgs)
         timer()
         self._trans_success = True
 
@@ -921,8 +995,10 @@ class Base(object):
 
         lock = dnf.lock.build_download_lock(self.conf.cachedir, self.conf.exit_on_lock)
         with lock:
-            drpm = dnf.drpm.DeltaInfo(self.sack.query().installed(),
-                                      progress, self.conf.deltarpm_percentage)
+            from dnf.drpm import DeltaInfo
+            drpm = DeltaInfo(self.sack.query().installed(),
+                             progress, self.conf.deltarpm_percentage,
+                             self.conf.deltarpm_jobs)
             remote_pkgs = [po for po in pkglist
                            if not po._is_local_pkg()]
             self._add_tempfiles([pkg.localPkg() for pkg in remote_pkgs])
@@ -930,6 +1006,7 @@ class Base(object):
             payloads = [dnf.repo._pkg2payload(pkg, progress, drpm.delta_factory,
                                              dnf.repo.RPMPayload)
                         for pkg in remote_pkgs]
+            drpm.report_selection()
 
             beg_download = time.time()
             est_remote_size = sum(pload.download_size for pload in payloads)
@@ -1003,10 +1080,48 @@ class Base(object):
             raise IOError(_("Could not open: {}").format(' '.join(pkgs_error)))
         return pkgs
 
-    def _sig_check_pkg(self, po):
+    def _verify_local_pkgs(self, pkgs):
+        """Return the set of the packages whose downloaded files verify.
+
+        The files are hashed concurrently, each at most once thanks to the
+        checksum persistor.
+
+        """
+        def verify(pkg):
+            return os.path.exists(pkg.localPkg()) and pkg.verifyLocalPkg()
+
+        pkgs = list(pkgs)
+        results = dnf.util._concurrent_map(verify, pkgs,
+                                           dnf.util._online_cpus())
+        return set(pkg for (pkg, (verified, _)) in zip(pkgs, results)
+                   if verified)
+
+    def _sig_check_wanted(self, po):
+        """Return whether the signature of the package is to be checked and
+        whether its repo has GPG keys configured."""
+        if po._from_cmdline:
+            return (self.conf.localpkg_gpgcheck, False)
+        repo = self.repos[po.repoid]
+        return (repo.gpgcheck, bool(repo.gpgkey))
+
+    def _sig_checker(self, pkgs):
+        """Return a checker of the signatures of the given packages.
+
+        The files are checked by up to gpgcheck_jobs threads.
+
+        """
+        packages = [po.localPkg() for po in pkgs
+                    if self._sig_check_wanted(po)[0]]
+        jobs = self.conf.gpgcheck_jobs or dnf.util._online_cpus()
+        return dnf.rpm.miscutils._SigChecker(
+            self.conf.installroot, packages, min(jobs, len(packages)))
+
+    def _sig_check_pkg(self, po, checker=None):
         """Verify the GPG signature of the given package object.
 
         :param po: the package object to verify the signature of
+        :param checker: the checker from :meth:`_sig_checker` to use, by
+           default the rpmdb keyring is read for the package alone
         :return: (result, error_string)
            where result is::
 
@@ -1015,20 +1130,17 @@ class Base(object):
                     might help.
               2 = Fatal GPG verification error, give up.
         """
-        if po._from_cmdline:
-            check = self.conf.localpkg_gpgcheck
-            hasgpgkey = 0
-        else:
-            repo = self.repos[po.repoid]
-            check = repo.gpgcheck
-            hasgpgkey = not not repo.gpgkey
+        (check, hasgpgkey) = self._sig_check_wanted(po)
 
         if check:
-            root = self.conf.installroot
-            ts = dnf.rpm.transaction.initReadOnlyTransaction(root)
-            sigresult = dnf.rpm.miscutils.checkSig(ts, po.localPkg())
+            if checker is None:
+                root = self.conf.installroot
+                ts = dnf.rpm.transaction.initReadOnlyTransaction(root)
+                sigresult = dnf.rpm.miscutils.checkSig(ts, po.localPkg())
+                del ts
+            else:
+                sigresult = checker.result(po.localPkg())
             localfn = os.path.basename(po.localPkg())
-            del ts
             if sigresult == 0:
                 result = 0
                 msg = ''
@@ -1118,15 +1230,17 @@ class Base(object):
 
     def _list_pattern(self, pkgnarrow, pattern, showdups, ignore_case,
                       reponame=None):
-        def is_from_repo(package):
-            """Test whether given package originates from the repository."""
-            if reponame is None:
-                return True
-            return self._yumdb.get_package(package).get('from_repo') == reponame
+        def status():
+            """Return the table of the installed packages of the sack."""
+            return self.sack._installed_status(self._yumdb)
 
         def pkgs_from_repo(packages):
             """Filter out the packages which do not originate from the repo."""
-            return (package for package in packages if is_from_repo(package))
+            packages = list(packages)
+            if reponame is None:
+                return packages
+            from_repo = status().from_repo(packages)
+            return [pkg for pkg in packages if from_repo[pkg] == reponame]
 
         def query_for_repo(query):
             """Filter out the packages which do not originate from the repo."""
@@ -1156,16 +1270,21 @@ class Base(object):
 
         # list all packages - those installed and available:
         if pkgnarrow == 'all':
-            dinst = {}
-            ndinst = {}  # Newest versions by name.arch
-            for po in q.installed():
-                dinst[po.pkgtup] = po
-                if showdups:
-                    continue
-                key = (po.name, po.arch)
-                if key not in ndinst or po > ndinst[key]:
-                    ndinst[key] = po
-            installed = list(pkgs_from_repo(dinst.values()))
+            if pattern is None:
+                dinst = status().by_pkgtup
+                ndinst = dict((key, pkgs[0])
+                              for (key, pkgs) in status().by_na.items())
+            else:
+                dinst = {}
+                ndinst = {}  # Newest versions by name.arch
+                for po in q.installed():
+                    dinst[po.pkgtup] = po
+                    if showdups:
+                        continue
+                    key = (po.name, po.arch)
+                    if key not in ndinst or po > ndinst[key]:
+                        ndinst[key] = po
+            installed = pkgs_from_repo(dinst.values())
 
             avail = query_for_repo(q)
             if not showdups:
@@ -1193,7 +1312,7 @@ class Base(object):
 
         # installed only
         elif pkgnarrow == 'installed':
-            installed = list(pkgs_from_repo(q.installed()))
+            installed = pkgs_from_repo(q.installed())
 
         # available in a repository
         elif pkgnarrow == 'available':
@@ -1213,10 +1332,16 @@ class Base(object):
                 # we will only look at the latest versions of packages:
                 available_dict = query_for_repo(
                     q).available().latest()._na_dict()
-                installed_dict = q.installed().latest()._na_dict()
+                if pattern is None:
+                    installed_dict = None
+                else:
+                    installed_dict = q.installed().latest()._na_dict()
                 for (name, arch) in available_dict:
                     avail_pkg = available_dict[(name, arch)][0]
-                    inst_pkg = installed_dict.get((name, arch), [None])[0]
+                    if installed_dict is None:
+                        inst_pkg = status().newest(name, arch)
+                    else:
+                        inst_pkg = installed_dict.get((name, arch), [None])[0]
                     if not inst_pkg or avail_pkg.evr_gt(inst_pkg):
                         available.append(avail_pkg)
                     elif avail_pkg.evr_eq(inst_pkg):
@@ -1231,7 +1356,7 @@ class Base(object):
 
         # not in a repo but installed
         elif pkgnarrow == 'extras':
-            extras = [pkg for pkg in q.extras() if is_from_repo(pkg)]
+            extras = pkgs_from_repo(q.extras())
 
         # obsoleting packages (and what they obsolete)
         elif pkgnarrow == 'obsoletes':
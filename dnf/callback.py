@@ -73,6 +73,16 @@ class DownloadProgress(object):
         """
         pass
 
+    def deltas_selected(self, considered, chosen, saving):
+        """Report the outcome of the delta RPM selection.
+
+        `considered` is the number of deltas found for the installed versions,
+        `chosen` the number of deltas that will be downloaded and `saving` the
+        number of bytes they save compared to the full packages.
+
+        """
+        pass
+
     def message(self, msg):
         pass
 
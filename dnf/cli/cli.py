@@ -30,25 +30,8 @@ from dnf.i18n import ucd, _
 
 import collections
 import dnf
+import dnf.callback
 import dnf.cli.commands
-import dnf.cli.commands.autoremove
-import dnf.cli.commands.check
-import dnf.cli.commands.clean
-import dnf.cli.commands.distrosync
-import dnf.cli.commands.downgrade
-import dnf.cli.commands.remove
-import dnf.cli.commands.group
-import dnf.cli.commands.install
-import dnf.cli.commands.makecache
-import dnf.cli.commands.mark
-import dnf.cli.commands.reinstall
-import dnf.cli.commands.repolist
-import dnf.cli.commands.repoquery
-import dnf.cli.commands.search
-import dnf.cli.commands.updateinfo
-import dnf.cli.commands.upgrade
-import dnf.cli.commands.upgrademinimal
-import dnf.cli.commands.upgradeto
 import dnf.cli.demand
 import dnf.cli.option_parser
 import dnf.conf
@@ -74,6 +57,32 @@ import time
 
 logger = logging.getLogger('dnf')
 
+# the commands imported only once dispatched: module, class, aliases
+_LAZY_COMMANDS = (
+    ('autoremove', 'AutoremoveCommand', ('autoremove',)),
+    ('check', 'CheckCommand', ('check',)),
+    ('clean', 'CleanCommand', ('clean',)),
+    ('distrosync', 'DistroSyncCommand',
+     ('distro-sync', 'distrosync', 'distribution-synchronization')),
+    ('downgrade', 'DowngradeCommand', ('downgrade',)),
+    ('group', 'GroupCommand',
+     ('group', 'groups', 'grouperase', 'groupinfo', 'groupinstall',
+      'grouplist', 'groupremove', 'groupupdate')),
+    ('install', 'InstallCommand', ('install', 'localinstall')),
+    ('makecache', 'MakeCacheCommand', ('makecache',)),
+    ('mark', 'MarkCommand', ('mark',)),
+    ('reinstall', 'ReinstallCommand', ('reinstall',)),
+    ('remove', 'RemoveCommand', ('remove', 'erase')),
+    ('repolist', 'RepoListCommand', ('repolist', 'repoinfo')),
+    ('repoquery', 'RepoQueryCommand', ('repoquery',)),
+    ('search', 'SearchCommand', ('search',)),
+    ('updateinfo', 'UpdateInfoCommand', ('updateinfo',)),
+    ('upgrade', 'UpgradeCommand', ('upgrade', 'update')),
+    ('upgrademinimal', 'UpgradeMinimalCommand',
+     ('upgrade-minimal', 'update-minimal')),
+    ('upgradeto', 'UpgradeToCommand', ('upgrade-to', 'update-to')),
+)
+
 
 def _add_pkg_simple_list_lens(data, pkg, indent=''):
     """ Get the length of each pkg's column. Add that to data.
@@ -130,6 +139,36 @@ def print_versions(pkgs, base, output):
         #                                    sm_ui_date(pkg.committime)))
 
 
+class _SigCheckProgress(dnf.callback.DownloadProgress):
+    """Passes the download progress on, submitting the finished packages to
+    the signature checker."""
+
+    def __init__(self, progress, checker):
+        self._progress = progress or dnf.callback.NullDownloadProgress()
+        self._checker = checker
+
+    def deltas_selected(self, considered, chosen, saving):
+        self._progress.deltas_selected(considered, chosen, saving)
+
+    def end(self, payload, status, msg):
+        self._progress.end(payload, status, msg)
+        # a downloaded delta is not the package yet, the rebuild ends later
+        rebuilt = status == dnf.callback.STATUS_DRPM
+        if rebuilt or (status in (dnf.callback.STATUS_OK,
+                                  dnf.callback.STATUS_ALREADY_EXISTS) and
+                       getattr(payload, 'delta', None) is None):
+            self._checker.submit(payload.pkg.localPkg())
+
+    def message(self, msg):
+        self._progress.message(msg)
+
+    def progress(self, payload, done):
+        self._progress.progress(payload, done)
+
+    def start(self, total_files, total_size):
+        self._progress.start(total_files, total_size)
+
+
 class BaseCli(dnf.Base):
     """This is the base class for yum cli."""
 
@@ -197,21 +236,30 @@ class BaseCli(dnf.Base):
 
         if trans:
             remote_pkgs = [pkg for pkg in install_pkgs if not pkg._is_local_pkg()]
-            if remote_pkgs:
-                logger.info(_('Downloading Packages:'))
-                try:
-                    total_cb = self.output.download_callback_total_cb
-                    self.download_packages(remote_pkgs, self.output.progress,
-                                           total_cb)
-                except dnf.exceptions.DownloadError as e:
-                    specific = dnf.cli.format.indent_block(ucd(e))
-                    errstr = _('Error downloading packages:') + '\n%s' % specific
-                    # setting the new line to prevent next chars being eaten up
-                    # by carriage returns
-                    print()
-                    raise dnf.exceptions.Error(errstr)
-            # Check GPG signatures
-            self.gpgsigcheck(install_pkgs)
+            # the signatures are checked while the downloads go on
+            checker = self._sig_checker(install_pkgs)
+            try:
+                for pkg in install_pkgs:
+                    if pkg._is_local_pkg():
+                        checker.submit(pkg.localPkg())
+                if remote_pkgs:
+                    logger.info(_('Downloading Packages:'))
+                    try:
+                        total_cb = self.output.download_callback_total_cb
+                        progress = _SigCheckProgress(self.output.progress,
+                                                     checker)
+                        self.download_packages(remote_pkgs, progress, total_cb)
+                    except dnf.exceptions.DownloadError as e:
+                        specific = dnf.cli.format.indent_block(ucd(e))
+                        errstr = _('Error downloading packages:') + '\n%s' % specific
+                        # setting the new line to prevent next chars being eaten up
+                        # by carriage returns
+                        print()
+                        raise dnf.exceptions.Error(errstr)
+                # Check GPG signatures
+                self.gpgsigcheck(install_pkgs, checker)
+            finally:
+                checker.close()
 
         if self.conf.downloadonly:
             return
@@ -227,36 +275,51 @@ class BaseCli(dnf.Base):
                 if tsi.op_type == dnf.transaction.FAIL:
                     raise dnf.exceptions.Error(_('Transaction failed'))
 
-    def gpgsigcheck(self, pkgs):
+    def gpgsigcheck(self, pkgs, checker=None):
         """Perform GPG signature verification on the given packages,
         installing keys if possible.
 
         :param pkgs: a list of package objects to verify the GPG
            signatures of
+        :param checker: a signature checker created for the packages,
+           one is created if not given
         :return: non-zero if execution should stop due to an error
         :raises: Will raise :class:`Error` if there's a problem
         """
-        for po in pkgs:
-            result, errmsg = self._sig_check_pkg(po)
+        pkgs = list(pkgs)
+        own_checker = None
+        if checker is None:
+            checker = own_checker = self._sig_checker(pkgs)
+        try:
+            for (i, po) in enumerate(pkgs):
+                result, errmsg = self._sig_check_pkg(po, checker)
 
-            if result == 0:
-                # Verified ok, or verify not req'd
-                continue
+                if result == 0:
+                    # Verified ok, or verify not req'd
+                    continue
 
-            elif result == 1:
-                ay = self.conf.assumeyes and not self.conf.assumeno
-                if (not sys.stdin or not sys.stdin.isatty()) and not ay:
-                    raise dnf.exceptions.Error(_('Refusing to automatically import keys when running ' \
-                            'unattended.\nUse "-y" to override.'))
+                elif result == 1:
+                    ay = self.conf.assumeyes and not self.conf.assumeno
+                    if (not sys.stdin or not sys.stdin.isatty()) and not ay:
+                        raise dnf.exceptions.Error(_('Refusing to automatically import keys when running ' \
+                                'unattended.\nUse "-y" to override.'))
 
-                # the callback here expects to be able to take options which
-                # userconfirm really doesn't... so fake it
-                fn = lambda x, y, z: self.output.userconfirm()
-                self._get_key_for_package(po, fn)
+                    # the callback here expects to be able to take options which
+                    # userconfirm really doesn't... so fake it
+                    fn = lambda x, y, z: self.output.userconfirm()
+                    self._get_key_for_package(po, fn)
 
-            else:
-                # Fatal error
-                raise dnf.exceptions.Error(errmsg)
+                    # the checker has not seen the imported keys
+                    if own_checker is not None:
+                        own_checker.close()
+                    checker = own_checker = self._sig_checker(pkgs[i + 1:])
+
+                else:
+                    # Fatal error
+                    raise dnf.exceptions.Error(errmsg)
+        finally:
+            if own_checker is not None:
+                own_checker.close()
 
         return 0
 
@@ -275,9 +338,9 @@ class BaseCli(dnf.Base):
                 highlight = self.output.term.MODE['bold']
                 if highlight:
                     # Do the local/remote split we get in "yum updates"
+                    verified = self._verify_local_pkgs(ypl.updates)
                     for po in sorted(ypl.updates):
-                        local = po.localPkg()
-                        if os.path.exists(local) and po.verifyLocalPkg():
+                        if po in verified:
                             local_pkgs[(po.name, po.arch)] = po
 
                 cul = self.conf.color_update_local
@@ -575,6 +638,7 @@ class BaseCli(dnf.Base):
 
     def history_rollback_transaction(self, extcmd):
         """Rollback given transaction."""
+        from dnf.yum.history import YumMergedHistoryTransaction
         old = self.history_get_transaction((extcmd,))
         if old is None:
             return 1, ['Failed history rollback, no transaction']
@@ -592,7 +656,7 @@ class BaseCli(dnf.Base):
                 logger.warning(_('Transaction history is incomplete, after %u.'), tid.tid)
 
             if mobj is None:
-                mobj = dnf.yum.history.YumMergedHistoryTransaction(tid)
+                mobj = YumMergedHistoryTransaction(tid)
             else:
                 mobj.merge(tid)
 
@@ -656,24 +720,9 @@ class Cli(object):
         self.command = None
         self.demands = dnf.cli.demand.DemandSheet() #:cli
 
-        self.register_command(dnf.cli.commands.autoremove.AutoremoveCommand)
-        self.register_command(dnf.cli.commands.check.CheckCommand)
-        self.register_command(dnf.cli.commands.clean.CleanCommand)
-        self.register_command(dnf.cli.commands.distrosync.DistroSyncCommand)
-        self.register_command(dnf.cli.commands.downgrade.DowngradeCommand)
-        self.register_command(dnf.cli.commands.group.GroupCommand)
-        self.register_command(dnf.cli.commands.install.InstallCommand)
-        self.register_command(dnf.cli.commands.makecache.MakeCacheCommand)
-        self.register_command(dnf.cli.commands.mark.MarkCommand)
-        self.register_command(dnf.cli.commands.reinstall.ReinstallCommand)
-        self.register_command(dnf.cli.commands.remove.RemoveCommand)
-        self.register_command(dnf.cli.commands.repolist.RepoListCommand)
-        self.register_command(dnf.cli.commands.repoquery.RepoQueryCommand)
-        self.register_command(dnf.cli.commands.search.SearchCommand)
-        self.register_command(dnf.cli.commands.updateinfo.UpdateInfoCommand)
-        self.register_command(dnf.cli.commands.upgrade.UpgradeCommand)
-        self.register_command(dnf.cli.commands.upgrademinimal.UpgradeMinimalCommand)
-        self.register_command(dnf.cli.commands.upgradeto.UpgradeToCommand)
+        for (module, cls_name, aliases) in _LAZY_COMMANDS:
+            self.register_command(dnf.cli.commands._LazyCommand(
+                'dnf.cli.commands.' + module, cls_name, aliases))
         self.register_command(dnf.cli.commands.InfoCommand)
         self.register_command(dnf.cli.commands.ListCommand)
         self.register_command(dnf.cli.commands.ProvidesCommand)
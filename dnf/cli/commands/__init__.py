@@ -35,6 +35,7 @@ import dnf.i18n
 import dnf.pycomp
 import dnf.util
 import functools
+import importlib
 import logging
 import operator
 import os
@@ -144,6 +145,33 @@ class Command(object):
         """Finalize operations post-transaction."""
         pass
 
+
+class _LazyCommand(object):
+    """Stands in for a command class until the command is dispatched.
+
+    The module of the command is imported on the first access to anything
+    but the aliases.
+
+    """
+
+    def __init__(self, module, cls_name, aliases):
+        self._module = module
+        self._cls_name = cls_name
+        self._cls = None
+        self.aliases = aliases
+
+    def _command_cls(self):
+        if self._cls is None:
+            module = importlib.import_module(self._module)
+            self._cls = getattr(module, self._cls_name)
+        return self._cls
+
+    def __call__(self, cli):
+        return self._command_cls()(cli)
+
+    def __getattr__(self, name):
+        return getattr(self._command_cls(), name)
+
 class InfoCommand(Command):
     """A class containing methods needed by the cli to execute the
     info command.
@@ -25,7 +25,9 @@ from dnf.i18n import _
 
 import argparse
 import dnf.cli
+import dnf.completion_cache
 import dnf.exceptions
+import dnf.search_index
 import dnf.util
 import logging
 
@@ -92,5 +94,7 @@ class MakeCacheCommand(commands.Command):
         if timer:
             persistor.reset_last_makecache = True
         self.base.fill_sack() # performs the md sync
+        dnf.search_index.update(self.base)
+        dnf.completion_cache.write(self.base)
         logger.info(_('Metadata cache created.'))
         return True
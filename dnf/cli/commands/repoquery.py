@@ -23,10 +23,13 @@ from dnf.i18n import _
 from dnf.cli import commands
 
 import argparse
+import collections
 import dnf
 import dnf.cli
 import dnf.exceptions
 import dnf.subject
+import functools
+import hashlib
 import logging
 import re
 
@@ -78,6 +81,50 @@ def rpm2py_format(queryformat):
     return fmt
 
 
+class _ProviderCache(object):
+    """Bounded LRU cache of the packages resolving a dependency."""
+
+    def __init__(self, size=10000):
+        self._size = size
+        self._cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, resolve_fn):
+        """Return the cached packages of the key, resolve them if missing."""
+        try:
+            pkgs = self._cache.pop(key)
+        except KeyError:
+            self.misses += 1
+            pkgs = resolve_fn()
+            if len(self._cache) >= self._size:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+        self._cache[key] = pkgs
+        return pkgs
+
+    def get_many(self, keys, resolve_fn):
+        """Return a dict mapping the keys to their cached packages, the
+        missing ones are resolved at once by resolve_fn(missing_keys)."""
+        found = {}
+        missing = []
+        for key in keys:
+            try:
+                found[key] = self._cache.pop(key)
+            except KeyError:
+                missing.append(key)
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            found.update(resolve_fn(missing))
+        for key in keys:
+            if key not in self._cache and len(self._cache) >= self._size:
+                self._cache.popitem(last=False)
+            self._cache[key] = found[key]
+        return found
+
+
 class RepoQueryCommand(commands.Command):
     """A class containing methods needed by the cli to execute the repoquery command.
     """
@@ -85,6 +132,10 @@ class RepoQueryCommand(commands.Command):
     aliases = ('repoquery',)
     summary = _('search for packages matching keyword')
 
+    def __init__(self, cli):
+        super(RepoQueryCommand, self).__init__(cli)
+        self._providers = _ProviderCache()
+
     @staticmethod
     def filter_repo_arch(opts, query):
         """Filter query by repoid and arch options"""
@@ -129,6 +180,9 @@ class RepoQueryCommand(commands.Command):
                             help=_('resolve capabilities to originating package(s)'))
         parser.add_argument("--tree", action="store_true",
                             help=_('show recursive tree for package(s)'))
+        parser.add_argument('--unsorted', action='store_true',
+                            help=_('print the results as they are found, '
+                                   'without sorting them'))
         parser.add_argument('--srpm', action='store_true',
                             help=_('operate on corresponding source RPM'))
         parser.add_argument("--latest-limit", dest='latest_limit', type=int,
@@ -229,19 +283,55 @@ class RepoQueryCommand(commands.Command):
 
     def by_all_deps(self, name, query):
         defaultquery = query.filter(name=name)
-        allpkgs = set()
-        requiresquery = query.filter(requires__glob=name)
-        for reqpkg in requiresquery.run():
-            allpkgs.add(reqpkg)
-        for pkg in defaultquery.run():
-            for provide in pkg.provides:
-                providequery = query.filter(requires=provide)
-                for needsprovidepkg in providequery.run():
-                    allpkgs.add(needsprovidepkg)
+        allpkgs = set(query.filter(requires__glob=name).run())
+        # all the provides are looked up at once
+        provides = [provide for pkg in defaultquery.run()
+                    for provide in pkg.provides]
+        if provides:
+            allpkgs.update(query.filter(requires=provides).run())
         alldepsquery = query.filter(pkg=allpkgs)
         return alldepsquery
 
     def run(self):
+        try:
+            self._run_query()
+        finally:
+            logger.debug(_('Dependency resolution cache: %d hits, %d misses'),
+                         self._providers.hits, self._providers.misses)
+
+    def _deplist_providers(self, req):
+        subject = dnf.subject.Subject(req)
+        query = subject.get_best_query(self.base.sack)
+        query = self.filter_repo_arch(self.opts, query.available())
+        if not self.opts.verbose:
+            query = query.latest()
+        return query.run()
+
+    def _whatprovides(self, reldeps, keys):
+        # one query over the sack finds the providers of all the reldeps, the
+        # ones of each reldep are then picked from them
+        candidates = self.base.sack.query().filter(
+            provides=[reldeps[key] for key in keys])
+        return dict((key, candidates.filter(provides=reldeps[key]).run())
+                    for key in keys)
+
+    def _tree_providers(self, pkgs, packageatr):
+        """Return a dict mapping the packages to the providers of their
+        packageatr reldeps, resolving the ones not cached yet together."""
+        reldeps = {}
+        for pkg in pkgs:
+            for reldep in getattr(pkg, packageatr):
+                reldeps[('provides', str(reldep))] = reldep
+        providers = self._providers.get_many(
+            list(reldeps), functools.partial(self._whatprovides, reldeps))
+
+        def pkg_providers(pkg):
+            return [provider for reldep in getattr(pkg, packageatr)
+                    for provider in providers[('provides', str(reldep))]]
+
+        return dict((pkg, pkg_providers(pkg)) for pkg in pkgs)
+
+    def _run_query(self):
         self.cli._populate_update_security_filter(self.opts)
         if self.opts.querytags:
             print(_('Available query-tags: use --queryformat ".. %{tag} .."'))
@@ -349,22 +439,24 @@ class RepoQueryCommand(commands.Command):
                 for rel in rels:
                     pkgs.add(str(rel))
         elif self.opts.deplist:
-            pkgs = []
-            for pkg in sorted(set(q.run())):
+            pkgs = q.run() if self.opts.unsorted else sorted(set(q.run()))
+            for (i, pkg) in enumerate(pkgs):
                 deplist_output = []
                 deplist_output.append('package: ' + str(pkg))
                 for req in sorted([str(req) for req in pkg.requires]):
                     deplist_output.append('  dependency: ' + req)
-                    subject = dnf.subject.Subject(req)
-                    query = subject.get_best_query(self.base.sack)
-                    query = self.filter_repo_arch(
-                        self.opts, query.available())
-                    if not self.opts.verbose:
-                        query = query.latest()
-                    for provider in query.run():
+                    providers = self._providers.get(
+                        ('deplist', req),
+                        functools.partial(self._deplist_providers, req))
+                    for provider in providers:
                         deplist_output.append('   provider: ' + str(provider))
-                pkgs.append('\n'.join(deplist_output))
-            print('\n\n'.join(pkgs))
+                if i:
+                    print('')
+                print('\n'.join(deplist_output))
+            return
+        elif self.opts.unsorted and not self.opts.resolve:
+            self._print_unsorted(self.build_format_fn(self.opts, pkg)
+                                 for pkg in q.run())
             return
         else:
             for pkg in q.run():
@@ -388,9 +480,33 @@ class RepoQueryCommand(commands.Command):
                     # there don't exist on the dnf Package object.
                     raise dnf.exceptions.Error(str(e))
 
+        if self.opts.unsorted:
+            self._print_unsorted(pkgs)
+            return
         for pkg in sorted(pkgs):
             print(pkg)
 
+    @staticmethod
+    def _print_unsorted(lines):
+        """Print the lines as they come, each of them only once.
+
+        Only digests of the printed lines are kept to tell the duplicates.
+
+        """
+        seen = set()
+        try:
+            for line in lines:
+                line = dnf.i18n.ucd(line)
+                digest = hashlib.sha1(line.encode('utf-8')).digest()
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                print(line)
+        except AttributeError as e:
+            # catch that the user has specified attributes
+            # there don't exist on the dnf Package object.
+            raise dnf.exceptions.Error(str(e))
+
     def grow_tree(self, level, pkg):
         if level == -1:
             print(pkg)
@@ -405,7 +521,13 @@ class RepoQueryCommand(commands.Command):
         print(spacing + "\_ " + str(pkg) + " " + reqstr)
 
     def tree_seed(self, query, aquery, opts, level=-1, usedpkgs=None):
-        for pkg in sorted(set(query.run()), key=lambda p: p.name):
+        pkgs = sorted(set(query.run()), key=lambda p: p.name)
+        if opts.packageatr:
+            # the whole level is resolved at once
+            providers = self._tree_providers(
+                [pkg for pkg in pkgs if level == -1 or pkg not in usedpkgs],
+                opts.packageatr)
+        for pkg in pkgs:
             usedpkgs = set() if usedpkgs is None or level is -1 else usedpkgs
             if pkg.name.startswith("rpmlib") or pkg.name.startswith("solvable"):
                 return
@@ -413,12 +535,9 @@ class RepoQueryCommand(commands.Command):
             if pkg not in usedpkgs:
                 usedpkgs.add(pkg)
                 if opts.packageatr:
-                    strpkg = getattr(pkg, opts.packageatr)
                     ar = {}
-                    for name in set(strpkg):
-                        pkgquery = self.base.sack.query().filter(provides=name)
-                        for querypkg in pkgquery:
-                            ar[querypkg.name + "." + querypkg.arch] = querypkg
+                    for querypkg in providers[pkg]:
+                        ar[querypkg.name + "." + querypkg.arch] = querypkg
                     pkgquery = self.base.sack.query().filter(
                         pkg=list(ar.values()))
                 else:
@@ -27,6 +27,7 @@ from dnf.i18n import ucd, _
 
 import dnf.i18n
 import dnf.match_counter
+import dnf.search_index
 import dnf.util
 import hawkey
 import logging
@@ -60,16 +61,14 @@ class SearchCommand(commands.Command):
             print(ucd(formatted))
 
         counter = dnf.match_counter.MatchCounter()
-        for arg in args:
-            self._search_counted(counter, 'name', arg)
-            self._search_counted(counter, 'summary', arg)
+        index = dnf.search_index.SackIndex(self.base)
+        self._search_fields(counter, index, ('name', 'summary'), args)
 
         section_text = _('N/S Matched: %s')
         if self.opts.all or counter.total() == 0:
             section_text = _('Matched: %s')
-            for arg in args:
-                self._search_counted(counter, 'description', arg)
-                self._search_counted(counter, 'url', arg)
+            self._search_fields(counter, index, ('description', 'url'), args)
+        index.close()
 
         matched_needles = None
         limit = None
@@ -85,11 +84,27 @@ class SearchCommand(commands.Command):
         if len(counter) == 0:
             raise dnf.exceptions.Error(_('No matches found.'))
 
-    def _search_counted(self, counter, attr, needle):
+    def _search_fields(self, counter, index, attrs, needles):
+        # the repos with an index answer the simple needles in one pass, the
+        # rest is left to hawkey
+        indexed = [needle for needle in needles
+                   if dnf.search_index.indexable(needle)]
+        for (pkg, attr, needle, length) in index.search(attrs, indexed):
+            counter.add(pkg, attr, needle, length)
+        unindexed = index.unindexed(self.base.sack.query())
+        for needle in needles:
+            query = unindexed if needle in indexed else None
+            for attr in attrs:
+                self._search_counted(counter, attr, needle, query)
+        return counter
+
+    def _search_counted(self, counter, attr, needle, query=None):
         fdict = {'%s__substr' % attr : needle}
         if dnf.util.is_glob_pattern(needle):
             fdict = {'%s__glob' % attr : needle}
-        q = self.base.sack.query().filter(hawkey.ICASE, **fdict)
+        if query is None:
+            query = self.base.sack.query()
+        q = query.filter(hawkey.ICASE, **fdict)
         for pkg in q.run():
             counter.add(pkg, attr, needle)
         return counter
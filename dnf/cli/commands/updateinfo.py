@@ -56,16 +56,28 @@ class UpdateInfoCommand(commands.Command):
         """Initialize the command."""
         super(UpdateInfoCommand, self).__init__(cli)
         self._ina2evr_cache = None
+        self._nevr_cache = None
         self.clear_installed_cache()
 
     def refresh_installed_cache(self):
         """Fill the cache of installed packages."""
         self._ina2evr_cache = {(pkg.name, pkg.arch): pkg.evr
                                for pkg in self.base.sack.query().installed()}
+        # Only versions of the installed names are ever looked up. Filter
+        # them all at once instead of querying the sack per advisory package.
+        names = list(set(name for (name, _) in self._ina2evr_cache))
+        query = self.base.sack.query().filter(name=names)
+        query = self.base._merge_update_filters(query, warning=False)
+        self._nevr_cache = {(pkg.name, pkg.evr) for pkg in query}
 
     def clear_installed_cache(self):
         """Clear the cache of installed packages."""
         self._ina2evr_cache = None
+        self._nevr_cache = None
+
+    def _filtered(self, apkg):
+        """Test whether a package of the version passes the update filters."""
+        return (apkg.name, apkg.evr) in self._nevr_cache
 
     def _older_installed(self, apackage):
         """Test whether an older version of a package is installed."""
@@ -76,8 +88,7 @@ class UpdateInfoCommand(commands.Command):
             ievr = self._ina2evr_cache[(apackage.name, apackage.arch)]
         except KeyError:
             return False
-        q = self.base.sack.query().filter(name=apackage.name, evr=apackage.evr)
-        if len(self.base._merge_update_filters(q, warning=False)) == 0:
+        if not self._filtered(apackage):
             return False
         return self.base.sack.evr_cmp(ievr, apackage.evr) < 0
 
@@ -90,8 +101,7 @@ class UpdateInfoCommand(commands.Command):
             ievr = self._ina2evr_cache[(apkg.name, apkg.arch)]
         except KeyError:
             return False
-        q = self.base.sack.query().filter(name=apkg.name, evr=apkg.evr)
-        if len(self.base._merge_update_filters(q, warning=False)) == 0:
+        if not self._filtered(apkg):
             return False
         return self.base.sack.evr_cmp(ievr, apkg.evr) >= 0
 
@@ -100,10 +110,9 @@ class UpdateInfoCommand(commands.Command):
         # Non-cached lookup not implemented. Fill the cache or implement the
         # functionality via the slow sack query.
         assert self._ina2evr_cache is not None
-        q = self.base.sack.query().filter(name=apkg.name, evr=apkg.evr)
-        if len(self.base._merge_update_filters(q, warning=False)) == 0:
+        if (apkg.name, apkg.arch) not in self._ina2evr_cache:
             return False
-        return (apkg.name, apkg.arch) in self._ina2evr_cache
+        return self._filtered(apkg)
 
     @staticmethod
     def set_argparser(parser):
@@ -141,9 +150,20 @@ class UpdateInfoCommand(commands.Command):
 
     def _apackage_advisory_installeds(self, pkgs, cmptype, req_apkg, specs=()):
         """Return (adv. package, advisory, installed) triplets and a flag."""
+        # The triplets of an advisory do not depend on the package it was
+        # found through, so every advisory is only walked once. Advisories of
+        # the same ID from different repositories can list different packages
+        # and are all walked.
+        seen = set()
         for package in pkgs:
             for advisory in package.get_advisories(cmptype):
-                for apackage in advisory.packages:
+                apackages = advisory.packages
+                key = (advisory.id, frozenset(
+                    (apkg.name, apkg.evr, apkg.arch) for apkg in apackages))
+                if key in seen:
+                    continue
+                seen.add(key)
+                for apackage in apackages:
                     passed = (req_apkg(apackage) and
                               self._apackage_advisory_match(
                                   apackage, advisory, specs))
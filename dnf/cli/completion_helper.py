@@ -23,6 +23,12 @@
 import dnf.exceptions
 import dnf.cli
 import dnf.cli.commands.clean
+import dnf.cli.commands.downgrade
+import dnf.cli.commands.install
+import dnf.cli.commands.reinstall
+import dnf.cli.commands.remove
+import dnf.cli.commands.repolist
+import dnf.cli.commands.upgrade
 import sys
 
 
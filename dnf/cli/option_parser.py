@@ -36,7 +36,7 @@ class OptionParser(argparse.ArgumentParser):
 
     def __init__(self):
         super(OptionParser, self).__init__()
-        self._cmd_usage = {} # names, summary for dnf commands, to build usage
+        self._cmd_usage_commands = {} # names, commands, to build usage
         self._cmd_groups = set() # cmd groups added (main, plugin)
         self.main_parser = self._main_parser()
         self.command_arg_parser = None
@@ -166,6 +166,9 @@ class OptionParser(argparse.ArgumentParser):
                                  default=None, help=_("verbose operation"))
         main_parser.add_argument("--version", action="store_true", default=None,
                                  help=_("show DNF version and exit"))
+        main_parser.add_argument("--profile-startup", action="store_true",
+                                 default=None,
+                                 help=_("print the time spent importing modules"))
         main_parser.add_argument("--installroot", help=_("set install root"),
                                  metavar='[path]')
         main_parser.add_argument("--noplugins", action="store_false",
@@ -310,12 +313,18 @@ class OptionParser(argparse.ArgumentParser):
 
     def _add_cmd_usage(self, cmd, group):
         """ store usage info about a single dnf command."""
-        summary = dnf.i18n.ucd(cmd.summary)
         name = dnf.i18n.ucd(cmd.aliases[0])
-        if not name in self._cmd_usage:
-            self._cmd_usage[name] = (group, summary)
+        if not name in self._cmd_usage_commands:
+            self._cmd_usage_commands[name] = (group, cmd)
             self._cmd_groups.add(group)
 
+    @property
+    def _cmd_usage(self):
+        """ names, group & summary for dnf commands, to build usage."""
+        # reading a summary imports the module of a lazily registered command
+        return {name: (group, dnf.i18n.ucd(cmd.summary))
+                for (name, (group, cmd)) in self._cmd_usage_commands.items()}
+
     def add_commands(self, cli_cmds, group):
         """ store name & summary for dnf commands
 
@@ -331,13 +340,14 @@ class OptionParser(argparse.ArgumentParser):
                 'plugin': _('List of Plugin Commands')}
         name = dnf.const.PROGRAM_NAME
         usage = '%s [options] COMMAND\n' % name
+        cmd_usage = self._cmd_usage
         for grp in ['main', 'plugin']:
             if not grp in self._cmd_groups:
                 # dont add plugin usage, if we dont have plugins
                 continue
             usage += "\n%s\n\n" % desc[grp]
-            for name in sorted(self._cmd_usage.keys()):
-                group, summary = self._cmd_usage[name]
+            for name in sorted(cmd_usage.keys()):
+                group, summary = cmd_usage[name]
                 if group == grp:
                     usage += "%-25s %s\n" % (name, summary)
         return usage
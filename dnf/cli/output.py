@@ -32,7 +32,6 @@ import dnf.crypto
 import dnf.i18n
 import dnf.transaction
 import dnf.util
-import dnf.yum.history
 import dnf.yum.misc
 import dnf.yum.packages
 import hawkey
@@ -875,6 +874,7 @@ class Output(object):
         locsize = 0
         insize = 0
         error = False
+        verified = self.base._verify_local_pkgs(packages)
         for pkg in packages:
             # Just to be on the safe side, if for some reason getting
             # the package size fails, log the error and don't report download
@@ -882,11 +882,8 @@ class Output(object):
             try:
                 size = int(pkg._size)
                 totsize += size
-                try:
-                    if pkg.verifyLocalPkg():
-                        locsize += size
-                except Exception:
-                    pass
+                if pkg in verified:
+                    locsize += size
 
                 if not installonly:
                     continue
@@ -1495,6 +1492,7 @@ Transaction Summary
             0 = we're done, exit
             1 = we've errored, exit with error string
         """
+        from dnf.yum.history import YumMergedHistoryTransaction
         tids = extcmds
         mtids = set()
         old = self.history.last()
@@ -1526,14 +1524,14 @@ Transaction Summary
             if lastdbv is not None and tid.tid == lasttid:
                 #  If this is the last transaction, is good and it doesn't
                 # match the current rpmdb ... then mark it as bad.
-                rpmdbv = self.sack._rpmdb_version(self.yumdb)
+                rpmdbv = self.base._rpmdb_version()
                 if lastdbv != rpmdbv:
                     tid.altered_gt_rpmdb = True
             lastdbv = None
 
             if tid.tid >= bmtid and tid.tid <= emtid:
                 if mobj is None:
-                    mobj = dnf.yum.history.YumMergedHistoryTransaction(tid)
+                    mobj = YumMergedHistoryTransaction(tid)
                 else:
                     mobj.merge(tid)
             elif mobj is not None:
@@ -1546,7 +1544,7 @@ Transaction Summary
                 if mtids:
                     bmtid, emtid = mtids.pop(0)
                     if tid.tid >= bmtid and tid.tid <= emtid:
-                        mobj = dnf.yum.history.YumMergedHistoryTransaction(tid)
+                        mobj = YumMergedHistoryTransaction(tid)
 
             if done:
                 print("-" * 79)
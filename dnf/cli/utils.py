@@ -108,6 +108,9 @@ def get_process_info(pid):
 def show_lock_owner(pid):
     """Output information about process holding a lock."""
 
+    if pid is None:
+        # held by shared lockers, they do not record their pids
+        return
     ps = get_process_info(pid)
     if not ps:
         msg = _('Unable to find information about the locking process (PID %d)')
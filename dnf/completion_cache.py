@@ -0,0 +1,215 @@
+# completion_cache.py
+# Package lists for the shell completion, readable without a sack.
+#
+# Copyright (C) 2016 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+from dnf.i18n import ucd
+
+import bisect
+import dnf.conf
+import dnf.const
+import dnf.exceptions
+import dnf.rpm
+import json
+import logging
+import os
+
+logger = logging.getLogger("dnf")
+
+_FILENAME = 'completion.json'
+
+# options the completion passes itself, they do not change the packages listed
+_NEUTRAL_OPTS = ('-C', '--cacheonly', '-q', '--quiet')
+_NEUTRAL_VALUE_OPTS = ('-d', '--debuglevel', '-e', '--errorlevel')
+
+
+def _entry(pkg):
+    # entries sort by the name, the NEVRA is what gets completed
+    return '%s %s' % (pkg.name, pkg)
+
+
+def _read(path):
+    try:
+        with open(path) as cache:
+            return json.load(cache)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _write(cachedir, content, installroot):
+    content['rpmdb'] = dnf.rpm._rpmdb_signature(installroot)
+    path = os.path.join(cachedir, _FILENAME)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as cache:
+            json.dump(content, cache)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+        logger.debug('completion cache %s not written: %s', path, ucd(e))
+
+
+def write(base):
+    """Store the packages of the sack for the shell completion."""
+    conf = base.conf
+    repos = {}
+    for pkg in base.sack.query().available():
+        if pkg.arch != 'src':
+            repos.setdefault(pkg.reponame, []).append(_entry(pkg))
+    installed = base.sack.query().installed()
+    content = {
+        'config': [conf.config_file_path] + list(conf.reposdir),
+        'installed': sorted(_entry(pkg) for pkg in installed),
+        'repos': {repo_id: sorted(entries)
+                  for (repo_id, entries) in repos.items()},
+    }
+    _write(conf.cachedir, content, conf.installroot)
+
+
+def update_installed(base, installed):
+    """Store the packages installed after a transaction."""
+    conf = base.conf
+    content = _read(os.path.join(conf.cachedir, _FILENAME))
+    if content is None:
+        return
+    content['installed'] = sorted(_entry(pkg) for pkg in installed)
+    _write(conf.cachedir, content, conf.installroot)
+
+
+def _newer_than(paths, mtime):
+    for path in paths:
+        try:
+            if os.stat(path).st_mtime > mtime:
+                return True
+            if os.path.isdir(path):
+                if _newer_than([os.path.join(path, fn)
+                                for fn in os.listdir(path)], mtime):
+                    return True
+        except OSError:
+            continue
+    return False
+
+
+def load(cachedir=dnf.const.SYSTEM_CACHEDIR, installroot='/'):
+    """Return the stored packages, None if there are none or they are stale."""
+    path = os.path.join(cachedir, _FILENAME)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    content = _read(path)
+    if content is None or \
+       content.get('rpmdb') != dnf.rpm._rpmdb_signature(installroot):
+        return None
+    if _newer_than(content['config'], mtime):
+        return None
+    return CompletionCache(content['installed'], content['repos'].values())
+
+
+def _with_prefix(entries, prefix):
+    start = bisect.bisect_left(entries, prefix)
+    for entry in entries[start:]:
+        if not entry.startswith(prefix):
+            break
+        yield entry.split(' ', 1)[1]
+
+
+class CompletionCache(object):
+    """Looks up the stored packages by a name prefix."""
+
+    def __init__(self, installed, repos):
+        self._installed = installed
+        self._repos = list(repos)
+
+    def available(self, prefix):
+        """Return the NEVRAs of the available packages named prefix*."""
+        return set(nevra for entries in self._repos
+                   for nevra in _with_prefix(entries, prefix))
+
+    def installed(self, prefix):
+        """Return the NEVRAs of the installed packages named prefix*."""
+        return set(_with_prefix(self._installed, prefix))
+
+
+def _cachedir():
+    # read the configuration the way the CLI does, the cachedir defaults to
+    # the one of the user for non-root users
+    conf = dnf.conf.Conf()
+    conf._search_inside_installroot('config_file_path')
+    conf.read(priority=dnf.conf.PRIO_MAINCONFIG)
+    conf.prepend_installroot('cachedir')
+    return conf.cachedir
+
+
+def complete(args):
+    """Print the package completions of the completion helper args.
+
+    Return False if the cache can not answer them, without printing anything.
+    That includes options selecting other repos or another installroot.
+
+    """
+    words = []
+    for arg in args:
+        if arg.startswith('-'):
+            break
+        words.append(arg)
+    opts = args[len(words):]
+    while opts:
+        opt = opts.pop(0)
+        if opt in _NEUTRAL_VALUE_OPTS:
+            opts = opts[1:]
+        elif opt.split('=', 1)[0] not in _NEUTRAL_VALUE_OPTS and \
+             opt not in _NEUTRAL_OPTS:
+            return False
+    if words[:2] in (['list', 'installed'], ['list', 'available']):
+        words = words[1:]
+    if len(words) != 2 or any(c in words[1] for c in '*?[ '):
+        return False
+    (command, prefix) = words
+    if command not in ('available', 'erase', 'install', 'installed',
+                       'reinstall', 'remove'):
+        return False
+    try:
+        cachedir = _cachedir()
+    except (dnf.exceptions.ConfigError, IOError, OSError):
+        return False
+    cache = load(cachedir)
+    if cache is None:
+        return False
+    if command in ('erase', 'installed', 'remove'):
+        pkgs = cache.installed(prefix)
+    elif command == 'available':
+        pkgs = cache.available(prefix)
+    elif command == 'install':
+        pkgs = cache.available(prefix) - cache.installed(prefix)
+    else:
+        pkgs = cache.available(prefix) & cache.installed(prefix)
+    for pkg in pkgs:
+        print(pkg)
+    return True
+
+
+def main(args):
+    """Run the shell completion, from the cache if it can answer it."""
+    if complete(args):
+        return
+    # the CLI is only imported when the cache can not be used
+    import dnf.cli.completion_helper
+    dnf.cli.completion_helper.main(args)
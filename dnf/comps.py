@@ -30,15 +30,19 @@ import dnf.util
 import fnmatch
 import gettext
 import itertools
-import libcomps
+import json
 import locale
 import logging
 import operator
+import os
 import re
 import sys
 
 logger = logging.getLogger("dnf")
 
+# only the commands working with comps need the extension
+libcomps = dnf.util._LazyModule('libcomps')
+
 # :api :binformat
 CONDITIONAL = 1
 DEFAULT     = 2
@@ -281,13 +285,6 @@ class Group(Forwarder):
 class Package(Forwarder):
     """Represents comps package data. :api"""
 
-    _OPT_MAP = {
-        libcomps.PACKAGE_TYPE_CONDITIONAL : CONDITIONAL,
-        libcomps.PACKAGE_TYPE_DEFAULT     : DEFAULT,
-        libcomps.PACKAGE_TYPE_MANDATORY   : MANDATORY,
-        libcomps.PACKAGE_TYPE_OPTIONAL    : OPTIONAL,
-    }
-
     def __init__(self, ipkg):
         self._i = ipkg
 
@@ -299,7 +296,136 @@ class Package(Forwarder):
     @property
     def option_type(self):
         # :api
-        return self._OPT_MAP[self.type]
+        opt_map = {
+            libcomps.PACKAGE_TYPE_CONDITIONAL : CONDITIONAL,
+            libcomps.PACKAGE_TYPE_DEFAULT     : DEFAULT,
+            libcomps.PACKAGE_TYPE_MANDATORY   : MANDATORY,
+            libcomps.PACKAGE_TYPE_OPTIONAL    : OPTIONAL,
+        }
+        return opt_map[self.type]
+
+
+# libcomps attributes kept in the comps cache
+_CACHED_ATTRS = {
+    'categories': ('id', 'name', 'desc', 'display_order'),
+    'environments': ('id', 'name', 'desc', 'display_order'),
+    'groups': ('id', 'name', 'desc', 'default', 'uservisible', 'biarchonly',
+               'display_order', 'lang_only'),
+    'group_ids': ('name', 'default'),
+    'packages': ('name', 'type', 'requires', 'basearchonly'),
+}
+_CACHED_LISTS = {
+    'categories': ('group_ids',),
+    'environments': ('group_ids', 'option_ids'),
+    'groups': ('packages',),
+}
+_CACHED_TYPES = {
+    'categories': 'Category',
+    'environments': 'Environment',
+    'groups': 'Group',
+    'group_ids': 'GroupId',
+    'packages': 'Package',
+}
+
+
+def _parse_xml(fn):
+    comps = libcomps.Comps()
+    ret = comps.fromxml_f(fn)
+    if ret == -1:
+        errors = comps.get_last_parse_errors()
+        raise CompsError(' '.join(errors))
+    return comps
+
+
+def _dump_item(iobj, kind):
+    dct = {attr: getattr(iobj, attr) for attr in _CACHED_ATTRS[kind]}
+    if kind in _CACHED_LISTS:
+        dct['name_by_lang'] = dict(iobj.name_by_lang.items())
+        dct['desc_by_lang'] = dict(iobj.desc_by_lang.items())
+    for lst in _CACHED_LISTS.get(kind, ()):
+        sub_kind = 'packages' if lst == 'packages' else 'group_ids'
+        dct[lst] = [_dump_item(sub, sub_kind) for sub in getattr(iobj, lst)]
+    return dct
+
+
+def _item_count(icomps):
+    count = 0
+    for (kind, lists) in _CACHED_LISTS.items():
+        for iobj in getattr(icomps, kind):
+            count += 1 + sum(len(getattr(iobj, lst)) for lst in lists)
+    return count
+
+
+def _dump_comps(icomps):
+    """Return the content of libcomps comps as plain data.
+
+    None if it has sections or attributes the cache does not keep.
+
+    """
+    if len(icomps.blacklist) or len(icomps.whiteout):
+        return None
+    # libcomps does not expose the arches of the items, filtering for no arch
+    # drops the items that have some
+    if _item_count(icomps.arch_filter([])) != _item_count(icomps):
+        return None
+    data = {kind: [_dump_item(iobj, kind) for iobj in getattr(icomps, kind)]
+            for kind in _CACHED_LISTS}
+    data['langpacks'] = dict(icomps.langpacks.items())
+    return data
+
+
+def _load_item(dct, kind):
+    cls = getattr(libcomps, _CACHED_TYPES[kind])
+    # the group ids and packages can not be created nameless
+    iobj = cls() if kind in _CACHED_LISTS else cls(name=dct['name'])
+    for attr in _CACHED_ATTRS[kind]:
+        if dct[attr] is not None:
+            setattr(iobj, attr, dct[attr])
+    if kind in _CACHED_LISTS:
+        for (lang, name) in dct['name_by_lang'].items():
+            iobj.name_by_lang[lang] = name
+        for (lang, desc) in dct['desc_by_lang'].items():
+            iobj.desc_by_lang[lang] = desc
+    for lst in _CACHED_LISTS.get(kind, ()):
+        sub_kind = 'packages' if lst == 'packages' else 'group_ids'
+        members = getattr(iobj, lst)
+        for sub in dct[lst]:
+            members.append(_load_item(sub, sub_kind))
+    return iobj
+
+
+def _load_comps(data):
+    """Return libcomps comps holding the data dumped by _dump_comps()."""
+    icomps = libcomps.Comps()
+    for kind in _CACHED_LISTS:
+        items = getattr(icomps, kind)
+        for dct in data[kind]:
+            items.append(_load_item(dct, kind))
+    for (name, install) in data['langpacks'].items():
+        icomps.langpacks[name] = install
+    return icomps
+
+
+def _read_cache(cache_fn, key):
+    try:
+        with open(cache_fn) as cache:
+            content = json.load(cache)
+    except (IOError, OSError, ValueError):
+        return None
+    if content.get('key') != key:
+        return None
+    return content['comps']
+
+
+def _write_cache(cache_fn, key, data):
+    tmp_fn = cache_fn + '.tmp'
+    try:
+        with open(tmp_fn, 'w') as cache:
+            json.dump({'key': key, 'comps': data}, cache)
+        os.rename(tmp_fn, cache_fn)
+    except (IOError, OSError) as e:
+        logger.debug('comps cache %s not written: %s', cache_fn, ucd(e))
+
 
 class Comps(object):
     # :api
@@ -323,12 +449,22 @@ class Comps(object):
     def _build_package(self, ipkg):
         return Package(ipkg)
 
-    def _add_from_xml_filename(self, fn):
-        comps = libcomps.Comps()
-        ret = comps.fromxml_f(fn)
-        if ret == -1:
-            errors = comps.get_last_parse_errors()
-            raise CompsError(' '.join(errors))
+    def _add_from_cache(self, cache_fn, key):
+        """Add the comps data cached under the key, tell if there were any."""
+        if key is None:
+            return False
+        data = _read_cache(cache_fn, key)
+        if data is None:
+            return False
+        self._i = self._i + _load_comps(data)
+        return True
+
+    def _add_from_xml_filename(self, fn, cache_fn=None, key=None):
+        comps = _parse_xml(fn)
+        if cache_fn is not None and key is not None:
+            data = _dump_comps(comps)
+            if data is not None:
+                _write_cache(cache_fn, key, data)
         self._i = self._i + comps
 
     @property
@@ -442,23 +578,16 @@ class Solver(object):
         return pkgs
 
     def _removable_pkg(self, pkg_name):
-        prst = self.persistor
-        count = 0
         if self._reason_fn(pkg_name) != 'group':
             return False
-        for id_ in prst.groups:
-            p_grp = prst.group(id_)
-            count += sum(1 for pkg in p_grp.full_list if pkg == pkg_name)
+        count = sum(self.persistor._groups_listing(pkg_name).values())
         return count < 2
 
     def _removable_grp(self, grp_name):
         prst = self.persistor
-        count = 0
         if not prst.group(grp_name).installed:
             return False
-        for id_ in prst.environments:
-            p_env = prst.environment(id_)
-            count += sum(1 for grp in p_env.full_list if grp == grp_name)
+        count = sum(prst._environments_listing(grp_name).values())
         return count < 2
 
     def _environment_install(self, env_id, pkg_types, exclude, strict=True):
@@ -709,6 +709,7 @@ class MainConf(BaseConfig):
         self._add_option('throttle', ThrottleOption(0))
         self._add_option('timeout', SecondsOption(120))
         self._add_option('max_parallel_downloads', IntOption(None, range_min=1))
+        self._add_option('metadata_sync_jobs', IntOption(3, range_min=1))
 
         self._add_option('metadata_expire',
                          SecondsOption(60 * 60 * 48))    # 48 hours
@@ -751,6 +752,10 @@ class MainConf(BaseConfig):
         self._add_option('deltarpm', BoolOption(True))
         self._add_option('deltarpm_percentage',
                          PositiveIntOption(75, names_of_0=["0", "<off>"]))
+        self._add_option('deltarpm_jobs',
+                         PositiveIntOption(0, names_of_0=["0", "<auto>"]))
+        self._add_option('gpgcheck_jobs',
+                         PositiveIntOption(0, names_of_0=["0", "<auto>"]))
 
         self._add_option('history_record', BoolOption(True))
         self._add_option('history_record_packages', ListOption(['dnf', 'rpm']))
@@ -27,10 +27,14 @@ from dnf.i18n import _
 import dnf.callback
 import dnf.logging
 import dnf.repo
+import dnf.util
 import hawkey
+import heapq
+import itertools
 import librepo
 import logging
 import os
+import threading
 
 APPLYDELTA = '/usr/bin/applydeltarpm'
 
@@ -83,26 +87,43 @@ class DeltaPayload(dnf.repo.PackagePayload):
 
 
 class DeltaInfo(object):
-    def __init__(self, query, progress, deltarpm_percentage=None):
+    def __init__(self, query, progress, deltarpm_percentage=None,
+                 deltarpm_jobs=None):
         '''A delta lookup and rebuild context
            query -- installed packages to use when looking up deltas
            progress -- progress obj to display finished delta rebuilds
+           deltarpm_jobs -- maximum number of parallel rebuilds, 0 for CPUs
         '''
         deltarpm = 0
         if os.access(APPLYDELTA, os.X_OK):
-            try:
-                deltarpm = os.sysconf('SC_NPROCESSORS_ONLN')
-            except:
-                deltarpm = 4
+            deltarpm = deltarpm_jobs or dnf.util._online_cpus()
         self.deltarpm = deltarpm
         self.deltarpm_percentage = \
             deltarpm_percentage or dnf.conf.Conf().deltarpm_percentage
         self.query = query
         self.progress = progress
 
+        # rebuilds run in worker threads while the downloads go on, the
+        # results are reported from the main thread
         self.queue = []
-        self.jobs = {}
+        self.done = []
         self.err = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._workers = 0
+        # delta selection statistics
+        self.considered = 0
+        self.chosen = 0
+        self.saving = 0
+
+    @property
+    @dnf.util.lazyattr('_priv_installed_evrs')
+    def _installed_evrs(self):
+        # installed evrs by (name, arch), computed once for all lookups
+        evrs = {}
+        for ipo in self.query:
+            evrs.setdefault((ipo.name, ipo.arch), []).append(ipo.evr)
+        return evrs
 
     def delta_factory(self, po, progress):
         '''Turn a po to Delta RPM po, if possible'''
@@ -119,58 +140,108 @@ class DeltaInfo(object):
 
         best = po._size * self.deltarpm_percentage / 100
         best_delta = None
-        for ipo in self.query.filter(name=po.name, arch=po.arch):
-            delta = po.get_delta_from_evr(ipo.evr)
-            if delta and delta.downloadsize < best:
+        for evr in self._installed_evrs.get((po.name, po.arch), ()):
+            delta = po.get_delta_from_evr(evr)
+            if not delta:
+                continue
+            self.considered += 1
+            if delta.downloadsize < best:
                 best = delta.downloadsize
                 best_delta = delta
         if best_delta:
+            self.chosen += 1
+            self.saving += po.downloadsize - best_delta.downloadsize
             return DeltaPayload(self, best_delta, po, progress)
         return None
 
-    def job_done(self, pid, code):
+    def report_selection(self):
+        '''Pass the delta selection statistics to the progress object'''
+        logger.log(dnf.logging.SUBDEBUG,
+                   'drpm: %d deltas considered, %d chosen, saving %d bytes',
+                   self.considered, self.chosen, self.saving)
+        self.progress.deltas_selected(self.considered, self.chosen,
+                                      self.saving)
+
+    def job_done(self, pload, code, cputime, verified):
         # handle a finished delta rebuild
-        logger.log(dnf.logging.SUBDEBUG, 'drpm: %d: return code: %d, %d', pid,
-                   code >> 8, code & 0xff)
+        logger.log(dnf.logging.SUBDEBUG,
+                   'drpm: %s: return code: %d, %d, CPU time: %.2fs', pload,
+                   code >> 8, code & 0xff, cputime)
 
-        pload = self.jobs.pop(pid)
         pkg = pload.pkg
         if code != 0:
             unlink_f(pload.pkg.localPkg())
             self.err[pkg] = [_('Delta RPM rebuild failed')]
-        elif not pload.pkg.verifyLocalPkg():
+        elif not verified:
             self.err[pkg] = [_('Checksum of the delta-rebuilt RPM failed')]
         else:
             os.unlink(pload.localPkg())
             self.progress.end(pload, dnf.callback.STATUS_DRPM, _('done'))
 
-    def start_job(self, pload):
-        # spawn a delta rebuild job
+    def _run_job(self, pload):
+        # run a delta rebuild, return its exit status and CPU time
         spawn_args = [APPLYDELTA, APPLYDELTA,
                       '-a', pload.pkg.arch,
                       pload.localPkg(), pload.pkg.localPkg()]
         pid = os.spawnl(os.P_NOWAIT, *spawn_args)
         logger.log(dnf.logging.SUBDEBUG, 'drpm: spawned %d: %s', pid,
                    ' '.join(spawn_args[1:]))
-        self.jobs[pid] = pload
+        _, code, rusage = os.wait4(pid, 0)
+        return code, rusage.ru_utime + rusage.ru_stime
+
+    def _work(self):
+        # rebuild the queued deltas, largest packages first
+        try:
+            while True:
+                with self._cond:
+                    if not self.queue:
+                        return
+                    pload = heapq.heappop(self.queue)[2]
+                try:
+                    code, cputime = self._run_job(pload)
+                    verified = code == 0 and pload.pkg.verifyLocalPkg()
+                except Exception as e:
+                    logger.log(dnf.logging.SUBDEBUG, 'drpm: %s: %s', pload, e)
+                    with self._cond:
+                        self.err[pload.pkg] = [
+                            _('Delta RPM rebuild failed: %s') % e]
+                    unlink_f(pload.pkg.localPkg())
+                    continue
+                with self._cond:
+                    self.done.append((pload, code, cputime, verified))
+                    self._cond.notify_all()
+        finally:
+            # the waiting main thread must learn about the worker ending
+            with self._cond:
+                self._workers -= 1
+                self._cond.notify_all()
+
+    def _report(self):
+        with self._cond:
+            done, self.done = self.done, []
+        for result in done:
+            self.job_done(*result)
 
     def enqueue(self, pload):
-        # process finished jobs, start new ones
-        while self.jobs:
-            pid, code = os.waitpid(-1, os.WNOHANG)
-            if not pid:
-                break
-            self.job_done(pid, code)
-        self.queue.append(pload)
-        while len(self.jobs) < self.deltarpm:
-            self.start_job(self.queue.pop(0))
-            if not self.queue:
-                break
+        # queue a downloaded delta, report finished rebuilds
+        with self._cond:
+            heapq.heappush(self.queue,
+                           (-pload._full_size, next(self._seq), pload))
+            if self._workers < self.deltarpm:
+                self._workers += 1
+                worker = threading.Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+        self._report()
 
     def wait(self):
         '''Wait until all jobs have finished'''
-        while self.jobs:
-            pid, code = os.wait()
-            self.job_done(pid, code)
-            if self.queue:
-                self.start_job(self.queue.pop(0))
+        while True:
+            with self._cond:
+                while self._workers and not self.done:
+                    # a timeout, so that Ctrl-C gets through in Python 2
+                    self._cond.wait(0.1)
+                idle = not self._workers
+            self._report()
+            if idle:
+                break
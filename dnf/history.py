@@ -24,7 +24,6 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from collections import defaultdict, Container, Iterable, Sized
 from dnf.util import is_exhausted, split_by
-from dnf.yum.history import YumHistory
 
 import dnf.exceptions
 
@@ -49,6 +48,7 @@ STATE2COMPLEMENT = {'Reinstall': 'Reinstalled',
 
 def open_history(database):
     """Open a history of transactions."""
+    from dnf.yum.history import YumHistory
     if isinstance(database, YumHistory):
         return _HistoryWrapper(database)
     else:
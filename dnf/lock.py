@@ -20,17 +20,17 @@
 
 from __future__ import absolute_import
 from __future__ import unicode_literals
-from dnf.exceptions import ProcessLockError, ThreadLockError, LockError
+from dnf.exceptions import ProcessLockError, ThreadLockError
 from dnf.i18n import _
 from dnf.yum import misc
 import dnf.logging
 import dnf.util
 import errno
+import fcntl
 import hashlib
 import logging
 import os
 import threading
-import time
 
 logger = logging.getLogger("dnf")
 
@@ -47,9 +47,9 @@ def build_download_lock(cachedir, exit_on_lock):
     return ProcessLock(os.path.join(_fit_lock_dir(cachedir), 'download_lock.pid'),
                        'cachedir', not exit_on_lock)
 
-def build_metadata_lock(cachedir, exit_on_lock):
+def build_metadata_lock(cachedir, exit_on_lock, shared=False):
     return ProcessLock(os.path.join(_fit_lock_dir(cachedir), 'metadata_lock.pid'),
-                       'metadata', not exit_on_lock)
+                       'metadata', not exit_on_lock, shared)
 
 
 def build_rpmdb_lock(persistdir, exit_on_lock):
@@ -57,13 +57,43 @@ def build_rpmdb_lock(persistdir, exit_on_lock):
                        'RPMDB', not exit_on_lock)
 
 
+class _Hold(object):
+    """A target locked by this process.
+
+    fcntl() locks belong to the process, all the ProcessLock objects of the
+    target share the descriptor its lock is held through.
+
+    """
+
+    def __init__(self, fd, shared):
+        self.count = 0
+        self.fd = fd
+        self.shared = shared
+
+
+# the holds of this process by (pid, target), the pid tells apart the holds
+# inherited over a fork, which the child does not have the locks of
+_HOLDS = {}
+_HOLDS_LOCK = threading.Lock()
+
+
 class ProcessLock(object):
-    def __init__(self, target, description, blocking=False):
+    """An fcntl() lock of the target file.
+
+    Exclusive holders write their pid into the target, shared holders leave it
+    empty. The last holder removes the target.
+
+    """
+
+    def __init__(self, target, description, blocking=False, shared=False):
         self.blocking = blocking
         self.count = 0
         self.description = description
+        self.shared = shared
         self.target = target
         self.thread_lock = threading.RLock()
+        self._hold = None
+        self._pid = None
 
     def _lock_thread(self):
         if not self.thread_lock.acquire(blocking=False):
@@ -71,44 +101,104 @@ class ProcessLock(object):
             raise ThreadLockError(msg)
         self.count += 1
 
-    def _try_lock(self):
-        pid = str(os.getpid()).encode('utf-8')
-        try:
-            fd = os.open(self.target, os.O_CREAT | os.O_WRONLY | os.O_EXCL, 0o644)
-            os.write(fd, pid)
+    def _try_lock(self, blocking, hold=None):
+        """Return the descriptor of the locked target, the pid of the holder
+        (None if unknown) if it is locked by another process.
+
+        The lock of the hold is converted if given.
+
+        """
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        if not blocking:
+            operation |= fcntl.LOCK_NB
+        while True:
+            if hold is None:
+                fd = os.open(self.target, os.O_CREAT | os.O_RDWR, 0o644)
+            else:
+                fd = hold.fd
+            try:
+                fcntl.lockf(fd, operation)
+            except (IOError, OSError) as e:
+                locked = e.errno in (errno.EACCES, errno.EAGAIN)
+                pid = self._read_pid(fd) if locked else None
+                if hold is None:
+                    os.close(fd)
+                if not locked:
+                    raise
+                return None, pid
+            if hold is not None:
+                # nobody removes the target while this process holds it
+                return fd, None
+            try:
+                current = os.path.samestat(os.fstat(fd), os.stat(self.target))
+            except OSError:
+                current = False
+            if current:
+                return fd, None
+            # removed by the previous holder while we waited
             os.close(fd)
-            return True
-        except OSError as e:
-            if e.errno == errno.EEXIST:   # File exists
-                return False
-            raise
 
-    def _try_read_lock(self):
+    @staticmethod
+    def _read_pid(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
         try:
-            with open(self.target, 'r') as f:
-                return int(f.readline())
-        except IOError:
-            return -1
+            return int(os.read(fd, 32))
         except ValueError:
-            time.sleep(2)
+            return None
+
+    def _mark(self, fd):
+        # a pid left behind belongs to a process that has not unlocked
+        os.ftruncate(fd, 0)
+        if not self.shared:
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, str(os.getpid()).encode('utf-8'))
+
+    def _acquire(self):
+        key = (os.getpid(), self.target)
+        hold = _HOLDS.get(key)
+        if hold is not None and (self.shared or not hold.shared):
+            # already locked by another object of this process
+            hold.count += 1
+            return hold
+        fd, pid = self._try_lock(False, hold)
+        if fd is None:
+            if not self.blocking:
+                if pid is None:
+                    msg = '%s already locked' % self.description
+                else:
+                    msg = '%s already locked by %d' % (self.description, pid)
+                raise ProcessLockError(msg, pid)
+            if pid is None:
+                msg = _('Waiting for the %s lock to be released.')
+                logger.info(msg, self.description)
+            else:
+                msg = _('Waiting for process with pid %d to finish.' % (pid))
+                logger.info(msg)
+            fd, pid = self._try_lock(True, hold)
+        self._mark(fd)
+        if hold is None:
+            hold = _HOLDS[key] = _Hold(fd, self.shared)
+        else:
+            # converted to exclusive until all the objects unlock
+            hold.shared = False
+        hold.count += 1
+        return hold
+
+    def _unlock(self):
+        hold = self._hold
+        self._hold = self._pid = None
+        with _HOLDS_LOCK:
+            hold.count -= 1
+            if hold.count:
+                return
+            del _HOLDS[(os.getpid(), self.target)]
             try:
-                with open(self.target, 'r') as f:
-                    return int(f.readline())
-            except IOError:
-                return -1
-            except ValueError:
-                msg = _('Malformed lock file found: %s.\n'
-                        'Ensure no other dnf process is running and '
-                        'remove the lock file manually or run '
-                        'systemd-tmpfiles --remove dnf.conf.' % (self.target))
-                raise LockError(msg)
-
-    def _try_unlink(self):
-        try:
-            os.unlink(self.target)
-            return True
-        except OSError:
-            return False
+                # only the last holder may remove the target
+                fcntl.lockf(hold.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.unlink(self.target)
+            except (IOError, OSError):
+                pass
+            os.close(hold.fd)
 
     def _unlock_thread(self):
         self.count -= 1
@@ -117,32 +207,19 @@ class ProcessLock(object):
     def __enter__(self):
         dnf.util.ensure_dir(os.path.dirname(self.target))
         self._lock_thread()
-        inform = True
-        prev_pid = 0
-        while not self._try_lock():
-            pid = self._try_read_lock()
-            if pid == -1:
-                # already removed by other process
-                continue
-            if pid == os.getpid():
-                # already locked by this process
-                return
-            if not os.access('/proc/%d/stat' % pid, os.F_OK):
-                # locked by a dead process
-                self._try_unlink()
-                continue
-            if not self.blocking:
-                self._unlock_thread()
-                msg = '%s already locked by %d' % (self.description, pid)
-                raise ProcessLockError(msg, pid)
-            if inform or prev_pid != pid:
-                msg = _('Waiting for process with pid %d to finish.' % (pid))
-                logger.info(msg)
-                inform = False
-                prev_pid = pid
-            time.sleep(2)
+        if self._hold is not None and self._pid == os.getpid():
+            # already locked by this object
+            return
+        try:
+            # the other threads wait for the lock of the process too
+            with _HOLDS_LOCK:
+                self._hold = self._acquire()
+        except:
+            self._unlock_thread()
+            raise
+        self._pid = os.getpid()
 
     def __exit__(self, *exc_args):
-        if self.count == 1:
-            os.unlink(self.target)
+        if self.count == 1 and self._pid == os.getpid():
+            self._unlock()
         self._unlock_thread()
@@ -21,7 +21,6 @@
 from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
-from functools import reduce
 
 WEIGHTS = {
     'name'		: 7,
@@ -38,6 +37,17 @@ def _canonize_string_set(sset, length):
     return l
 
 
+class _MatchRecord(object):
+    """Sort data of all the matches of one package."""
+
+    __slots__ = ('weights', 'distance', 'needles')
+
+    def __init__(self):
+        self.weights = 0
+        self.distance = 0
+        self.needles = set()
+
+
 class MatchCounter(dict):
     """Map packages to which of their attributes matched in a search against
     what values.
@@ -46,25 +56,22 @@ class MatchCounter(dict):
 
     """
 
-    @staticmethod
-    def _eval_weights(pkg, matches):
-        # how much is each match worth and return their sum:
-        def weight(match):
-            key = match[0]
-            needle = match[1]
-            haystack = getattr(pkg, key)
-            coef = 2 if haystack == needle else 1
-            return coef * WEIGHTS[key]
+    def __init__(self):
+        super(MatchCounter, self).__init__()
+        self._haystack_lens = {}
+        self._records = {}
+        self._total = 0
 
-        return sum(map(weight, matches))
+    @staticmethod
+    def _eval_weight(pkg, key, needle, haystack_len):
+        # how much is the match worth:
+        exact = haystack_len == len(needle) and getattr(pkg, key) == needle
+        coef = 2 if exact else 1
+        return coef * WEIGHTS[key]
 
     @staticmethod
-    def _eval_distance(pkg, matches):
-        dist = 0
-        for (key, needle) in matches:
-            haystack = getattr(pkg, key)
-            dist += len(haystack) - len(needle)
-        return dist
+    def _eval_distance(pkg, key, needle, haystack_len):
+        return haystack_len - len(needle)
 
     def _key_func(self):
         """Get the key function used for sorting matches.
@@ -80,19 +87,43 @@ class MatchCounter(dict):
         """
         max_length = self._max_needles()
         def get_key(pkg):
-            return (self._eval_weights(pkg, self[pkg]),
-                    _canonize_string_set(self.matched_needles(pkg), max_length),
-                    -self._eval_distance(pkg, self[pkg]))
+            record = self._record(pkg)
+            return (record.weights,
+                    _canonize_string_set(record.needles, max_length),
+                    -record.distance)
         return get_key
 
     def _max_needles(self):
         """Return the max count of needles of all packages."""
         if self:
-            return max(len(self.matched_needles(pkg)) for pkg in self)
+            return max(len(self._record(pkg).needles) for pkg in self)
         return 0
 
-    def add(self, pkg, key, needle):
+    def _record(self, pkg):
+        """Return the sort data of the package, evaluated once per package."""
+        record = self._records.get(pkg)
+        if record is not None:
+            return record
+        record = self._records[pkg] = _MatchRecord()
+        for (key, needle) in self[pkg]:
+            haystack_len = self._haystack_lens.get((pkg, key))
+            if haystack_len is None:
+                haystack_len = self._haystack_lens[(pkg, key)] = \
+                    len(getattr(pkg, key))
+            record.weights += self._eval_weight(pkg, key, needle, haystack_len)
+            record.distance += self._eval_distance(pkg, key, needle,
+                                                   haystack_len)
+            record.needles.add(needle)
+        return record
+
+    def add(self, pkg, key, needle, haystack_len=None):
+        """Record the match, `haystack_len` is the length of the matched
+        attribute if it is known already."""
         self.setdefault(pkg, []).append((key, needle))
+        self._total += 1
+        if haystack_len is not None:
+            self._haystack_lens[(pkg, key)] = haystack_len
+        self._records.pop(pkg, None)
 
     def dump(self):
         for pkg in self:
@@ -105,11 +136,11 @@ class MatchCounter(dict):
         return set(m[0] for m in self[pkg])
 
     def matched_needles(self, pkg):
-        return set(m[1] for m in self[pkg])
+        return set(self._record(pkg).needles)
 
     def sorted(self, reverse=False, limit_to=None):
         keys = limit_to if limit_to else self.keys()
         return sorted(keys, key=self._key_func(), reverse=reverse)
 
     def total(self):
-        return reduce(lambda total, pkg: total + len(self[pkg]), self, 0)
+        return self._total
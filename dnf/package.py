@@ -228,8 +228,8 @@ class Package(hawkey.Package):
         if self._from_cmdline:
             return True # local package always verifies against itself
         (chksum_type, chksum) = self.returnIdSum()
-        real_sum = dnf.yum.misc.checksum(chksum_type, self.localPkg(),
-                                         datasize=self._size)
+        real_sum = self.base._checksum_persistor.checksum(
+            chksum_type, self.localPkg(), datasize=self._size)
         if real_sum != chksum:
             logger.debug('%s: %s check failed: %s vs %s',
                          self, chksum_type, real_sum, chksum)
@@ -30,6 +30,7 @@ from dnf.i18n import _
 import collections
 import distutils.version
 import dnf.util
+import dnf.yum.misc
 import errno
 import fnmatch
 import json
@@ -87,13 +88,13 @@ def _diff_dcts(dct1, dct2):
     for key in keys1 & keys2:
         val1 = dct1[key]
         val2 = dct2[key]
-        if type(val1) is type(val2) is dict:
+        if isinstance(val1, dict) and isinstance(val2, dict):
             added_dct, removed_dct = _diff_dcts(val1, val2)
             if added_dct:
                 added[key] = added_dct
             if removed_dct:
                 removed[key] = removed_dct
-        elif type(val1) is type(val2) is list:
+        elif isinstance(val1, list) and isinstance(val2, list):
             set1 = set(val1)
             set2 = set(val2)
             added_set = set2 - set1
@@ -141,6 +142,128 @@ class ClonableDict(collections.MutableMapping):
         return cls.wrap_dict(_clone_dct(self.dct))
 
 
+class _MemberList(list):
+    """A full_list letting the index of its owner know about its changes."""
+
+    def __init__(self, iterable, index, owner):
+        super(_MemberList, self).__init__(iterable)
+        self._index = index
+        self._owner = owner
+
+    def _changed(self):
+        self._index._dirty.add(self._owner)
+
+    def __delitem__(self, key):
+        super(_MemberList, self).__delitem__(key)
+        self._changed()
+
+    def __delslice__(self, i, j):
+        # Python 2 only
+        super(_MemberList, self).__delslice__(i, j)
+        self._changed()
+
+    def __iadd__(self, other):
+        super(_MemberList, self).__iadd__(other)
+        self._changed()
+        return self
+
+    def __imul__(self, n):
+        super(_MemberList, self).__imul__(n)
+        self._changed()
+        return self
+
+    def __setitem__(self, key, val):
+        super(_MemberList, self).__setitem__(key, val)
+        self._changed()
+
+    def __setslice__(self, i, j, seq):
+        # Python 2 only
+        super(_MemberList, self).__setslice__(i, j, seq)
+        self._changed()
+
+    def append(self, member):
+        super(_MemberList, self).append(member)
+        self._changed()
+
+    def extend(self, iterable):
+        super(_MemberList, self).extend(iterable)
+        self._changed()
+
+    def insert(self, i, member):
+        super(_MemberList, self).insert(i, member)
+        self._changed()
+
+    def pop(self, *args):
+        member = super(_MemberList, self).pop(*args)
+        self._changed()
+        return member
+
+    def remove(self, member):
+        super(_MemberList, self).remove(member)
+        self._changed()
+
+
+class _MemberIndex(object):
+    """Maps the members of the full lists in a db subdict to their owners.
+
+    Changed lists are only marked dirty and reindexed on the next lookup.
+
+    """
+
+    def __init__(self, owners):
+        self._owners = owners
+        self._counts = {}
+        self._indexed = {}
+        self._lists = {}
+        self._dirty = set()
+        for id_ in owners:
+            self.track(id_)
+
+    def _refresh(self):
+        # catch owners and full lists added, deleted or replaced behind our
+        # back
+        for owner in set(self._owners) | set(self._lists):
+            dct = self._owners.get(owner)
+            full_list = None if dct is None else dct.get('full_list')
+            if full_list is not self._lists.get(owner):
+                self._dirty.add(owner)
+        for owner in self._dirty:
+            for member in self._indexed.pop(owner, ()):
+                owners = self._counts[member]
+                owners[owner] -= 1
+                if not owners[owner]:
+                    del owners[owner]
+                    if not owners:
+                        del self._counts[member]
+            self._lists.pop(owner, None)
+            dct = self._owners.get(owner)
+            if dct is None:
+                continue
+            members = self._indexed[owner] = list(self._wrap(owner, dct))
+            for member in members:
+                owners = self._counts.setdefault(member, {})
+                owners[owner] = owners.get(owner, 0) + 1
+        self._dirty.clear()
+
+    def owners(self, member):
+        """Return a dict of owners mapped to how often they list the member."""
+        self._refresh()
+        return dict(self._counts.get(member, {}))
+
+    def _wrap(self, owner, dct):
+        full_list = dct.get('full_list')
+        if full_list is None:
+            return ()
+        if getattr(full_list, '_index', None) is not self:
+            full_list = dct['full_list'] = _MemberList(full_list, self, owner)
+        self._lists[owner] = full_list
+        return full_list
+
+    def track(self, owner):
+        self._wrap(owner, self._owners[owner])
+        self._dirty.add(owner)
+
+
 class _PersistMember(object):
     DEFAULTS = ClonableDict({
         'name' : '',
@@ -253,21 +376,26 @@ class GroupPersistor(object):
             'meta' : {'version' : '0.6.0'}
         })
 
+    _indexed_db = None
+    _indexes = None
+    _original_content = None
+    _priv_original = None
+
     def __init__(self, persistdir, comps=None):
         self._commit = False
         self._comps = comps
         self._dbfile = os.path.join(persistdir, 'groups.json')
         self.db = None
-        self._original = None
         self._load()
         self._ensure_sanity()
 
     def _access(self, subdict, id_):
-        subdict = self.db[subdict]
-        dct = subdict.get(id_)
+        members = self.db[subdict]
+        dct = members.get(id_)
         if dct is None:
             dct = _PersistMember.default()
-            subdict[id_] = dct
+            members[id_] = dct
+            self._index(subdict).track(id_)
 
         return _PersistMember(dct)
 
@@ -314,17 +442,28 @@ class GroupPersistor(object):
         logger.warning(_('Invalid groups database, clearing.'))
         self.db = self._empty_db()
 
+    def _index(self, subdict):
+        """Return the reverse index of the full lists in the db subdict."""
+        if self._indexed_db is not self.db:
+            self._indexes = {}
+            self._indexed_db = self.db
+        index = self._indexes.get(subdict)
+        if index is None:
+            index = self._indexes[subdict] = _MemberIndex(self.db[subdict])
+        return index
+
     def _load(self):
         self.db = self._empty_db()
         try:
             with open(self._dbfile) as db:
                 content = db.read()
                 self.db = ClonableDict.wrap_dict(json.loads(content))
+                # the pristine copy is only parsed again if it is needed
+                self._original_content = content
                 self._migrate()
         except IOError as e:
             if e.errno != errno.ENOENT:
                 raise
-        self._original = self.db.clone()
 
     def _migrate(self):
         try:
@@ -333,6 +472,7 @@ class GroupPersistor(object):
             msg = _('Unsupported installed groups database found, resetting.')
             logger.warning(msg)
             self.db = self._empty_db()
+            self._original_content = None
             version = self.db['meta']['version']
         else:
             current = self._empty_db()['meta']['version']
@@ -344,9 +484,24 @@ class GroupPersistor(object):
                 self.db['meta']['version'] = current
                 self.commit()
                 self.save()
+                self._original = self.db.clone()
 
         logger.debug('group persistor md version: %s', version)
 
+    @property
+    def _original(self):
+        if self._priv_original is None:
+            if self._original_content is None:
+                self._priv_original = self._empty_db()
+            else:
+                self._priv_original = ClonableDict.wrap_dict(
+                    json.loads(self._original_content))
+        return self._priv_original
+
+    @_original.setter
+    def _original(self, val):
+        self._priv_original = val
+
     def _prune_db(self):
         for members_dct in (self.db['ENVIRONMENTS'], self.db['GROUPS']):
             del_list = []
@@ -372,6 +527,10 @@ class GroupPersistor(object):
     def environments(self):
         return self.db['ENVIRONMENTS']
 
+    def _environments_listing(self, grp_id):
+        """Return the environments listing the group, with the counts."""
+        return self._index('ENVIRONMENTS').owners(grp_id)
+
     def environments_by_pattern(self, pattern, case_sensitive=False):
         return _by_pattern(pattern, self.environments,
                            self.environment, case_sensitive)
@@ -383,7 +542,7 @@ class GroupPersistor(object):
         for g in self.diff().new_groups:
             all_pkgs = set(self.group(g).full_list)
             installed_in_group = list(all_pkgs.intersection(ins))
-            self.group(g).param_dct['full_list'] = installed_in_group
+            self.group(g).full_list[:] = installed_in_group
 
     def group(self, id_):
         return self._access('GROUPS', id_)
@@ -392,6 +551,10 @@ class GroupPersistor(object):
     def groups(self):
         return self.db['GROUPS']
 
+    def _groups_listing(self, pkg_name):
+        """Return the groups listing the package, with the counts."""
+        return self._index('GROUPS').owners(pkg_name)
+
     def groups_by_pattern(self, pattern, case_sensitive=False):
         return _by_pattern(pattern, self.groups,
                            self.group, case_sensitive)
@@ -403,8 +566,7 @@ class GroupPersistor(object):
         if self.db == self._original:
             return False
         logger.debug('group persistor: saving.')
-        with open(self._dbfile, 'w') as db:
-            json.dump(self.db.dct, db)
+        JSONDB._write_json_db(self._dbfile, self.db.dct)
         self._commit = False
         return True
 
@@ -430,8 +592,66 @@ class JSONDB(object):
 
     @staticmethod
     def _write_json_db(json_path, content):
-        with open(json_path, 'w') as f:
+        """Replace the db atomically so a crash can not leave it truncated."""
+        tmp_path = json_path + '.tmp'
+        with open(tmp_path, 'w') as f:
             json.dump(content, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, json_path)
+
+
+class ChecksumPersistor(JSONDB):
+    """Remembers the checksums of the package files.
+
+    A checksum is reused while the size, mtime and inode of its file stay the
+    same, so a package is hashed only once. Stores to cachedir.
+
+    """
+
+    # read the packages in large chunks, hashing releases the GIL meanwhile
+    _CHUNK = 2**20
+
+    def __init__(self, cachedir):
+        self.db_path = os.path.join(cachedir, "checksums.json")
+        self._changed = False
+        # read up front, checksum() is called from several threads
+        try:
+            content = self._get_json_db(self.db_path, default={})
+        except (IOError, OSError, ValueError):
+            content = {}
+        self._checksums = content if isinstance(content, dict) else {}
+
+    def checksum(self, sumtype, path, datasize=None):
+        """Return dnf.yum.misc.checksum() of the file, from the cache if the
+        file did not change since it was hashed."""
+        try:
+            st = os.stat(path)
+            stamp = [st.st_size, st.st_mtime, st.st_ino, datasize]
+        except OSError:
+            stamp = None
+        key = '%s:%s' % (sumtype, path)
+        entry = self._checksums.get(key)
+        if stamp is not None and entry is not None and entry[:-1] == stamp:
+            return entry[-1]
+        real_sum = dnf.yum.misc.checksum(sumtype, path, self._CHUNK, datasize)
+        if stamp is not None:
+            self._checksums[key] = stamp + [real_sum]
+            self._changed = True
+        return real_sum
+
+    def save(self):
+        if not self._changed:
+            return
+        # forget the files that are gone
+        content = dict((key, entry) for (key, entry)
+                       in self._checksums.items()
+                       if os.path.exists(key.split(':', 1)[1]))
+        try:
+            self._write_json_db(self.db_path, content)
+        except (IOError, OSError):
+            logger.debug("Failed storing the package checksums.")
+        self._changed = False
 
 
 class RepoPersistor(JSONDB):
@@ -474,6 +694,33 @@ class RepoPersistor(JSONDB):
             return None
 
 
+class RpmdbVersionPersistor(JSONDB):
+    """Caches the rpmdb version together with the state it was computed from.
+
+    Stores to persistdir.
+
+    """
+
+    def __init__(self, persistdir):
+        self.db_path = os.path.join(persistdir, "rpmdb_version.json")
+
+    def get(self, key):
+        """Return the cached version if it was stored under `key`."""
+        try:
+            content = self._get_json_db(self.db_path, default={})
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(content, dict) or content.get('key') != key:
+            return None
+        return content.get('version')
+
+    def save(self, key, version):
+        try:
+            self._write_json_db(self.db_path, {'key': key, 'version': version})
+        except (IOError, OSError):
+            logger.debug("Failed storing the rpmdb version.")
+
+
 class TempfilePersistor(JSONDB):
 
     def __init__(self, cachedir):
@@ -22,6 +22,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from dnf.i18n import ucd, _
 
+import contextlib
 import dnf.callback
 import dnf.conf
 import dnf.conf.substitutions
@@ -42,6 +43,7 @@ import os
 import re
 import shutil
 import string
+import threading
 import time
 import types
 
@@ -63,7 +65,7 @@ CACHE_FILES = {
     'metadata': r'^%s\/.*(xml(\.gz|\.xz|\.bz2)?|asc|cachecookie|%s)$' %
                 (_CACHEDIR_RE, _MIRRORLIST_FILENAME),
     'packages': r'^%s\/%s\/.+rpm$' % (_CACHEDIR_RE, _PACKAGES_RELATIVE_DIR),
-    'dbcache': r'^.+(solv|solvx)$',
+    'dbcache': r'^(.+(solv|solvx|search|comps\.json)|completion\.json)$',
 }
 
 logger = logging.getLogger("dnf")
@@ -136,6 +138,73 @@ def _download_payloads(payloads, drpm):
     return errs
 
 
+def _revive_repos(repos, jobs):
+    """Check concurrently whether the expired cached metadata are current.
+
+    Revived repos can use their cache right away, the others go on to download
+    fresh metadata without checking again.
+
+    """
+    def probe(repo):
+        with repo._concurrent_sync(dnf.callback.NullDownloadProgress()):
+            return repo._probe_revive()
+
+    cached = [r for r in repos if r.metadata]
+    timer = dnf.logging.Timer('metadata revive (%d repos)' % len(cached))
+    results = dnf.util._concurrent_map(probe, cached, jobs)
+    timer()
+    for (repo, (revived, _)) in zip(cached, results):
+        if revived:
+            repo._revive()
+        else:
+            repo._revive_rejected = True
+
+
+def _sync_repos(repos, jobs):
+    """Download or revive the metadata of the given repos concurrently.
+
+    At most `jobs` repos are synced at the same time. Repos that need to import
+    GPG keys are left for the serial load in Base.fill_sack().
+
+    Returns a dict mapping repo IDs to the exception their sync raised.
+
+    """
+    if jobs < 2:
+        return {}
+    pending = [r for r in repos if not r.repo_gpgcheck and not r._cache_usable()]
+    if len(pending) < 2:
+        return {}
+    _revive_repos(pending, jobs)
+    pending = [r for r in pending if not r._cache_usable()]
+    if not pending:
+        return {}
+
+    progresses = {}
+    for repo in pending:
+        progress = repo._md_pload.progress
+        if id(progress) not in progresses:
+            progresses[id(progress)] = _SyncProgress(progress)
+        progresses[id(progress)]._total_files += 1
+    for sync_progress in progresses.values():
+        sync_progress._start()
+
+    def sync(repo):
+        with repo._concurrent_sync(progresses[id(repo._md_pload.progress)]):
+            return repo.load()
+
+    timer = dnf.logging.Timer('metadata sync (%d repos)' % len(pending))
+    try:
+        results = dnf.util._concurrent_map(sync, pending, jobs)
+    except KeyboardInterrupt:
+        # the handles of the syncs are not interruptible, abort them here
+        for sync_progress in progresses.values():
+            sync_progress._abort()
+        raise
+    timer()
+    return {repo.id: exc for (repo, (_, exc)) in zip(pending, results)
+            if exc is not None}
+
+
 def _update_saving(saving, payloads, errs):
     real, full = saving
     for pload in payloads:
@@ -177,6 +246,61 @@ class _DownloadErrors(object):
         return pload.download_size
 
 
+class _SyncProgress(dnf.callback.DownloadProgress):
+    """Shares one progress bar among repos syncing their metadata concurrently.
+
+    Calls to the wrapped progress are serialized and the individual start()
+    calls of the repos are replaced by a single start() for all of them.
+
+    """
+    def __init__(self, progress):
+        self._progress = progress
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self._total_files = 0
+        self._aborted = False
+
+    def _abort(self):
+        """Make the downloads reporting here fail at their next progress."""
+        self._aborted = True
+
+    def _start(self):
+        self._progress.start(self._total_files, 1)
+
+    def message(self, msg):
+        with self._lock:
+            self._progress.message(msg)
+
+    def start(self, total_files, total_size):
+        pass
+
+    def progress(self, payload, done):
+        if self._aborted:
+            # librepo stops the transfer when its progress callback fails
+            raise dnf.exceptions.RepoError(_('Metadata download interrupted.'))
+        with self._lock:
+            self._sizes[payload] = payload.download_size
+            self._progress.progress(
+                _SyncPayload(payload, sum(self._sizes.values())), done)
+
+    def end(self, payload, status, msg):
+        with self._lock:
+            self._progress.end(payload, status, msg)
+
+
+class _SyncPayload(object):
+    """Payload proxy reporting the summed size of all concurrent syncs."""
+    def __init__(self, payload, total_size):
+        self._payload = payload
+        self.download_size = total_size
+
+    def __str__(self):
+        return str(self._payload)
+
+    def __unicode__(self):
+        return dnf.pycomp.unicode(self._payload)
+
+
 class _DetailedLibrepoError(Exception):
     def __init__(self, librepo_err, source_url):
         Exception.__init__(self)
@@ -252,6 +376,14 @@ class Metadata(object):
     def _comps_fn(self):
         return self._repo_dct.get("group_gz") or self._repo_dct.get("group")
 
+    @property
+    def _comps_checksum(self):
+        record = self._repomd_dct.get('group_gz') or \
+            self._repomd_dct.get('group')
+        if not isinstance(record, dict):
+            return None
+        return record.get('checksum')
+
     @property
     def _content_tags(self):
         return self._repomd_dct.get('content_tags')
@@ -469,6 +601,8 @@ class Repo(dnf.conf.RepoConf):
         self._substitutions = dnf.conf.substitutions.Substitutions()
         self._max_mirror_tries = 0  # try them all
         self._handle = None
+        self._interruptible = True
+        self._revive_rejected = False
         self._hawkey_repo = self._init_hawkey_repo()
         self._check_config_file_age = parent_conf.check_config_file_age \
             if parent_conf is not None else True
@@ -635,6 +769,7 @@ class Repo(dnf.conf.RepoConf):
                     self.max_parallel_downloads)
         h.varsub = _subst2tuples(self._substitutions)
         h.destdir = destdir
+        h.interruptible = self._interruptible
         self._set_ip_resolve(h)
 
         # setup mirror URLs
@@ -797,6 +932,59 @@ class Repo(dnf.conf.RepoConf):
         else:
             return self._try_revive_by_repomd()
 
+    def _probe_revive(self):
+        """Like _try_revive() but never raises, logs the decision and timing."""
+        start = time.time()
+        try:
+            revived = self._try_revive()
+        except _DetailedLibrepoError as e:
+            logger.debug("reviving: check for '%s' failed: %s.", self.id,
+                         e.librepo_msg)
+            revived = False
+        decision = 'revive' if revived else 'refresh'
+        logger.debug("reviving: '%s' decided to %s in %d ms.", self.id,
+                     decision, (time.time() - start) * 1000)
+        return revived
+
+    def _revive(self):
+        """Mark the expired metadata current again."""
+        self.metadata._reset_age()
+        self._expired = False
+
+    def _cache_usable(self):
+        """Load the cached metadata and decide whether they can be used as is.
+
+        Returns False if the metadata have to be downloaded or revived.
+
+        """
+        if self.metadata or self._try_cache():
+            if self._check_config_file_age and self.repofile \
+                    and dnf.util.file_age(self.repofile) < self.metadata._age:
+                self._md_expire_cache()
+            if self._sync_strategy in (SYNC_ONLY_CACHE, SYNC_LAZY) or \
+               not self._expired:
+                return True
+        return False
+
+    @contextlib.contextmanager
+    def _concurrent_sync(self, progress):
+        """Prepare the repo for syncing from a worker thread.
+
+        librepo swaps the process-wide SIGINT handler in interruptible
+        handles, which is not safe with several handles performing at once.
+        The waiting main thread takes the SIGINT instead and aborts the sync
+        through the progress.
+
+        """
+        orig_progress = self._md_pload.progress
+        self._md_pload.progress = progress
+        self._interruptible = False
+        try:
+            yield
+        finally:
+            self._md_pload.progress = orig_progress
+            self._interruptible = True
+
     def _configure_from_options(self, opts):
         if getattr(opts, 'cacheonly', None):
             self._md_only_cached = True
@@ -833,22 +1021,18 @@ class Repo(dnf.conf.RepoConf):
         Returns True if this call to load() caused a fresh metadata download.
 
         """
-        if self.metadata or self._try_cache():
-            if self._check_config_file_age and self.repofile \
-                    and dnf.util.file_age(self.repofile) < self.metadata._age:
-                self._md_expire_cache()
-            if self._sync_strategy in (SYNC_ONLY_CACHE, SYNC_LAZY) or \
-               not self._expired:
+        if self._cache_usable():
+            if not self.metadata.fresh:
                 logger.debug('repo: using cache for: %s', self.id)
-                return False
+            return False
         if self._sync_strategy == SYNC_ONLY_CACHE:
             msg = "Cache-only enabled but no cache for '%s'" % self.id
             raise dnf.exceptions.RepoError(msg)
+        revive_rejected, self._revive_rejected = self._revive_rejected, False
         try:
-            if self._try_revive():
+            if not revive_rejected and self._try_revive():
                 # the expired metadata still reflect the origin:
-                self.metadata._reset_age()
-                self._expired = False
+                self._revive()
                 return True
 
             with dnf.util.tmpdir() as tmpdir:
@@ -23,8 +23,12 @@ from . import transaction
 from dnf.pycomp import is_py3bytes
 import dnf.const
 import dnf.exceptions
+import os
 import rpm
 
+# files any rpmdb backend rewrites when the database changes
+_RPMDB_FILES = ('Packages', 'Packages.db', 'rpmdb.sqlite')
+
 
 def detect_releasever(installroot):
     # :api
@@ -62,6 +66,71 @@ def detect_releasever(installroot):
     return None
 
 
+def _rpmdb_signature(installroot):
+    """Return the stat data of the rpmdb files that change with its content."""
+    dbpath = os.path.join(installroot, rpm.expandMacro('%{_dbpath}').lstrip('/'))
+    signature = []
+    for fn in _RPMDB_FILES:
+        try:
+            st = os.stat(os.path.join(dbpath, fn))
+        except OSError:
+            continue
+        signature.append([fn, st.st_mtime, st.st_size, st.st_ino])
+    return signature
+
+
+class _InstalledHeader(object):
+    """Installed package as read directly from an rpmdb header.
+
+    Provides the attributes the yumdb and the history need from an installed
+    package without loading the system repo into a sack.
+
+    """
+
+    _HISTORY_TAGS = ('buildtime', 'buildhost', 'license', 'packager', 'size',
+                     'sourcerpm', 'url', 'vendor')
+    _from_system = True
+
+    def __init__(self, hdr):
+        self.name = _tag_str(hdr['name'])
+        self.epoch = hdr['epoch'] or 0
+        self.version = _tag_str(hdr['version'])
+        self.release = _tag_str(hdr['release'])
+        self.arch = _tag_str(hdr['arch'])
+        self._pkgid = _tag_str(hdr['sha1header'])
+        self.rpmdbid = hdr['dbinstance']
+        for tag in self._HISTORY_TAGS:
+            setattr(self, tag, _tag_str(hdr[tag]))
+
+    def __str__(self):
+        return '%s-%s.%s' % (self.name, self.evr, self.arch)
+
+    @property
+    def evr(self):
+        if self.epoch:
+            return '%s:%s-%s' % (self.epoch, self.version, self.release)
+        return '%s-%s' % (self.version, self.release)
+
+    @property
+    def pkgtup(self):
+        return (self.name, self.arch, str(self.epoch), self.version,
+                self.release)
+
+
+def _tag_str(val):
+    if is_py3bytes(val):
+        return str(val, "utf-8")
+    return val
+
+
+def _installed_headers(ts, names):
+    """Return the installed packages of the given names, read from rpmdb."""
+    pkgs = []
+    for name in sorted(set(names)):
+        pkgs.extend(_InstalledHeader(hdr) for hdr in ts.dbMatch('name', name))
+    return pkgs
+
+
 def _header(path):
     """Return RPM header of the file."""
     ts = transaction.initReadOnlyTransaction()
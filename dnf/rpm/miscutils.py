@@ -15,10 +15,16 @@
 
 from __future__ import print_function, absolute_import
 from __future__ import unicode_literals
+import collections
 import dnf.pycomp
+import dnf.rpm.transaction
 import rpm
 import os
 import locale
+import threading
+
+# the keyrings of the checking threads are loaded one at a time
+_keyring_lock = threading.Lock()
 
 
 def checkSig(ts, package):
@@ -61,6 +67,100 @@ def checkSig(ts, package):
     return value
 
 
+class _SigChecker(object):
+    """Runs checkSig() on the given package files.
+
+    With more than one job the files are checked in worker threads, rpm does
+    not hold the GIL while reading and verifying them. Each worker reads the
+    keyring into its own transaction set once. Files can be submitted as soon
+    as they are complete; asking for a result submits all the remaining ones.
+    Keys imported after the checker was created are not seen by it.
+
+    """
+
+    def __init__(self, root, packages, jobs=1):
+        self._root = root
+        self._pending = collections.OrderedDict.fromkeys(packages)
+        self._queue = collections.deque()
+        self._submitted = set()
+        self._results = {}
+        self._cond = threading.Condition()
+        self._jobs = jobs if jobs > 1 else 0
+        self._workers = 0
+        self._closed = False
+        self._ts = None
+
+    def _work(self):
+        ts = None
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue:
+                        if self._closed or not self._pending:
+                            return
+                        self._cond.wait()
+                    package = self._queue.popleft()
+                try:
+                    if ts is None:
+                        with _keyring_lock:
+                            ts = dnf.rpm.transaction.initReadOnlyTransaction(
+                                self._root)
+                            result = checkSig(ts, package)
+                    else:
+                        result = checkSig(ts, package)
+                except Exception as e:
+                    # raised by result() in the thread asking for it
+                    result = e
+                with self._cond:
+                    self._results[package] = result
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._workers -= 1
+                self._cond.notify_all()
+
+    def close(self):
+        # the workers end after the files being checked
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+        self._ts = None
+
+    def submit(self, package):
+        with self._cond:
+            if not self._jobs or self._closed or package not in self._pending:
+                return
+            del self._pending[package]
+            self._submitted.add(package)
+            self._queue.append(package)
+            if self._workers < self._jobs:
+                self._workers += 1
+                worker = threading.Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+            self._cond.notify_all()
+
+    def result(self, package):
+        """Return the checkSig() result of the package."""
+        if self._jobs:
+            for pending in list(self._pending):
+                self.submit(pending)
+            with self._cond:
+                while package in self._submitted and \
+                        package not in self._results and self._workers:
+                    # a timeout, so that Ctrl-C gets through in Python 2
+                    self._cond.wait(0.1)
+                result = self._results.get(package)
+            if isinstance(result, Exception):
+                raise result
+            if result is not None:
+                return result
+        if self._ts is None:
+            self._ts = dnf.rpm.transaction.initReadOnlyTransaction(self._root)
+        return checkSig(self._ts, package)
+
+
 def getSigInfo(hdr):
     """checks signature from an hdr hand back signature information and/or
        an error code"""
@@ -59,9 +59,44 @@ class SackVersion(object):
             self._chksum.update(csum[1])
 
 
+class _InstalledStatus(object):
+    """Table of the installed packages of a sack, built in a single pass."""
+
+    def __init__(self, sack, yumdb):
+        self._yumdb = yumdb
+        self._from_repo = {}
+        self.by_pkgtup = {}
+        self.by_na = {}
+        for pkg in sack.query().installed():
+            self.by_pkgtup[pkg.pkgtup] = pkg
+            self.by_na.setdefault((pkg.name, pkg.arch), []).append(pkg)
+        for pkgs in self.by_na.values():
+            pkgs.sort(reverse=True)
+
+    def from_repo(self, pkgs):
+        """Return a dict mapping the pkgs to the repos they came from.
+
+        The yumdb data are fetched at once for the packages not seen yet.
+
+        """
+        pkgs = list(pkgs)
+        missing = [pkg for pkg in pkgs if pkg not in self._from_repo]
+        if missing:
+            for (pkg, ydbi) in self._yumdb.get_many(missing).items():
+                self._from_repo[pkg] = ydbi.get('from_repo')
+        return {pkg: self._from_repo[pkg] for pkg in pkgs}
+
+    def newest(self, name, arch):
+        """Return the newest installed name.arch package, None if there is
+        none."""
+        pkgs = self.by_na.get((name, arch))
+        return pkgs[0] if pkgs else None
+
+
 class Sack(hawkey.Sack):
     def __init__(self, *args, **kwargs):
         super(Sack, self).__init__(*args, **kwargs)
+        self._priv_installed_status = None
 
     def _configure(self, installonly=None, installonly_limit=0):
         if installonly:
@@ -81,16 +116,27 @@ class Sack(hawkey.Sack):
         excl = excl.difference(pkgq)
         self.add_excludes(excl)
 
+    def _installed_status(self, yumdb):
+        """Return the table of the installed packages, it is built once."""
+        if self._priv_installed_status is None:
+            self._priv_installed_status = _InstalledStatus(self, yumdb)
+        return self._priv_installed_status
+
     def _rpmdb_version(self, yumdb):
-        pkgs = self.query().installed().run()
-        main = SackVersion()
-        for pkg in pkgs:
-            ydbi = yumdb.get_package(pkg)
-            csum = None
-            if 'checksum_type' in ydbi and 'checksum_data' in ydbi:
-                csum = (ydbi.checksum_type, ydbi.checksum_data)
-            main._update(pkg, csum)
-        return main
+        return _rpmdb_version(self.query().installed().run(), yumdb)
+
+
+def _rpmdb_version(pkgs, yumdb):
+    """Return the SackVersion of the installed packages pkgs."""
+    ydbis = yumdb.get_many(pkgs)
+    main = SackVersion()
+    for pkg in pkgs:
+        ydbi = ydbis[pkg]
+        csum = None
+        if 'checksum_type' in ydbi and 'checksum_data' in ydbi:
+            csum = (ydbi.checksum_type, ydbi.checksum_data)
+        main._update(pkg, csum)
+    return main
 
 
 def _build_sack(base):
@@ -0,0 +1,263 @@
+# search_index.py
+# Persistent per-repo token index answering package searches.
+#
+# Copyright (C) 2016 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from dnf.i18n import ucd
+from dnf.yum.sqlutils import sqlite, executeSQL
+
+import dnf.logging
+import dnf.util
+import dnf.yum.misc
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger("dnf")
+
+FIELDS = ('name', 'summary', 'description', 'url')
+
+_INDEX_SUFFIX = '.search'
+_SELECT_CHUNK = 500
+
+_CREATE_OPS = ['''\
+ CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+''', '''\
+ CREATE TABLE pkgs (
+     id INTEGER PRIMARY KEY, nevra TEXT NOT NULL, name TEXT NOT NULL,
+     name_len INTEGER, summary_len INTEGER, description_len INTEGER,
+     url_len INTEGER);
+''', '''\
+ CREATE TABLE tokens (token TEXT PRIMARY KEY, postings TEXT NOT NULL);
+''']
+
+
+def _index_path(cachedir, repo_id):
+    return os.path.join(cachedir, repo_id + _INDEX_SUFFIX)
+
+
+def _repo_packages(base, repo):
+    return base.sack.query().filter(reponame=repo.id)
+
+
+def _index_key(base, repo):
+    """Return what the index of the repo is valid for, None if unknown.
+
+    The index holds the packages of the repo that are in the sack, so it is
+    only valid while the same excludes leave the same number of them there.
+    The ones excluded since it was built are dropped from the search hits.
+
+    """
+    try:
+        repomd_fn = repo._repomd_fn
+    except AttributeError:
+        return None
+    if not repomd_fn or not os.path.exists(repomd_fn):
+        return None
+    conf = base.conf
+    excludes = [conf.disable_excludes, conf.includepkgs, conf.excludepkgs,
+                repo.includepkgs, repo.excludepkgs]
+    count = len(_repo_packages(base, repo))
+    return ' '.join([dnf.yum.misc.checksum('sha256', repomd_fn)] +
+                    ['|'.join(sorted(lst)) for lst in excludes] + [str(count)])
+
+
+def indexable(needle):
+    """Tell whether the needle can be looked up in the index."""
+    return not dnf.util.is_glob_pattern(needle) and len(needle.split()) == 1
+
+
+class _RepoIndex(object):
+    def __init__(self, repo_id, conn):
+        self.repo_id = repo_id
+        self._conn = conn
+
+    @classmethod
+    def open(cls, path, repo_id, key):
+        """Return the index stored in path, None if it is missing or stale."""
+        if not os.path.exists(path):
+            return None
+        conn = None
+        try:
+            conn = sqlite.connect(path)
+            cur = conn.cursor()
+            executeSQL(cur, "SELECT value FROM meta WHERE key='key'")
+            row = cur.fetchone()
+        except sqlite.DatabaseError as e:
+            logger.debug('search index %s unusable: %s', path, ucd(e))
+            if conn is not None:
+                conn.close()
+            return None
+        if row is None or row[0] != key:
+            conn.close()
+            return None
+        return cls(repo_id, conn)
+
+    @staticmethod
+    def build(path, key, pkgs):
+        """Write the index of pkgs to path."""
+        rows = []
+        postings = {}
+        for (pkg_id, pkg) in enumerate(pkgs):
+            values = [ucd(getattr(pkg, field) or '') for field in FIELDS]
+            rows.append([pkg_id, ucd(pkg), pkg.name] +
+                        [len(value) for value in values])
+            for (field_id, value) in enumerate(values):
+                code = pkg_id * len(FIELDS) + field_id
+                for token in set(value.lower().split()):
+                    postings.setdefault(token, []).append(str(code))
+
+        # concurrent builds each write their own file, the last one wins
+        (fd, tmp_path) = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=os.path.basename(path) + '.',
+            suffix='.tmp')
+        os.close(fd)
+        try:
+            conn = sqlite.connect(tmp_path)
+            try:
+                cur = conn.cursor()
+                for op in _CREATE_OPS:
+                    cur.execute(op)
+                cur.executemany(
+                    "INSERT INTO pkgs VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                cur.executemany("INSERT INTO tokens VALUES (?, ?)",
+                                ((token, ' '.join(codes))
+                                 for (token, codes) in postings.items()))
+                executeSQL(cur, "INSERT INTO meta VALUES ('key', ?)", (key,))
+                conn.commit()
+            finally:
+                conn.close()
+            os.rename(tmp_path, path)
+        finally:
+            dnf.yum.misc.unlink_f(tmp_path)
+
+    def close(self):
+        self._conn.close()
+
+    def search(self, fields, needles):
+        """Return a dict mapping ids of the matching packages to their
+        (field, needle) matches.
+
+        All the needles are looked up in a single pass over the tokens.
+
+        """
+        if not needles:
+            return {}
+        wanted = set(FIELDS.index(field) for field in fields)
+        lowered = [(needle, needle.lower()) for needle in needles]
+        sql = "SELECT token, postings FROM tokens WHERE %s" % \
+            ' OR '.join(['instr(token, ?)'] * len(lowered))
+        cur = self._conn.cursor()
+        executeSQL(cur, sql, [low for (_, low) in lowered])
+        found = {}
+        for (token, postings) in cur:
+            for (needle, low) in lowered:
+                if low in token:
+                    found.setdefault(needle, set()).update(postings.split())
+        hits = {}
+        for (needle, codes) in found.items():
+            for code in codes:
+                (pkg_id, field_id) = divmod(int(code), len(FIELDS))
+                if field_id in wanted:
+                    matches = hits.setdefault(pkg_id, set())
+                    matches.add((FIELDS[field_id], needle))
+        return hits
+
+    def packages(self, pkg_ids):
+        """Return a dict mapping the package ids to their (nevra, name,
+        field lengths) rows."""
+        pkg_ids = list(pkg_ids)
+        rows = {}
+        cur = self._conn.cursor()
+        for i in range(0, len(pkg_ids), _SELECT_CHUNK):
+            chunk = pkg_ids[i:i + _SELECT_CHUNK]
+            sql = "SELECT * FROM pkgs WHERE id IN (%s)"
+            executeSQL(cur, sql % ','.join('?' * len(chunk)), chunk)
+            for row in cur:
+                rows[row[0]] = (row[1], row[2], dict(zip(FIELDS, row[3:])))
+        return rows
+
+
+class SackIndex(object):
+    """Searches the packages of the enabled repos that have a fresh index."""
+
+    def __init__(self, base):
+        self._sack = base.sack
+        self._indexes = []
+        for repo in base.repos.iter_enabled():
+            key = _index_key(base, repo)
+            if key is None:
+                continue
+            path = _index_path(base.conf.cachedir, repo.id)
+            index = _RepoIndex.open(path, repo.id, key)
+            if index is not None:
+                self._indexes.append(index)
+
+    def close(self):
+        for index in self._indexes:
+            index.close()
+
+    def search(self, fields, needles):
+        """Yield (pkg, field, needle, haystack length) of indexed matches.
+
+        Matches of packages the sack does not have, like the excluded ones,
+        are skipped.
+
+        """
+        for index in self._indexes:
+            hits = index.search(fields, needles)
+            rows = index.packages(hits)
+            names = set(name for (_, name, _) in rows.values())
+            if not names:
+                continue
+            pkgs = self._sack.query().filter(reponame=index.repo_id,
+                                             name=list(names))
+            pkgs = dict((ucd(pkg), pkg) for pkg in pkgs)
+            for (pkg_id, (nevra, _, lengths)) in rows.items():
+                pkg = pkgs.get(nevra)
+                if pkg is None:
+                    continue
+                for (field, needle) in hits[pkg_id]:
+                    yield (pkg, field, needle, lengths[field])
+
+    def unindexed(self, query):
+        """Filter out the packages of the indexed repos from the query."""
+        for index in self._indexes:
+            query = query.filter(reponame__neq=index.repo_id)
+        return query
+
+
+def update(base):
+    """Rebuild the missing and stale indexes of the enabled repos."""
+    for repo in base.repos.iter_enabled():
+        key = _index_key(base, repo)
+        if key is None:
+            continue
+        path = _index_path(base.conf.cachedir, repo.id)
+        index = _RepoIndex.open(path, repo.id, key)
+        if index is not None:
+            index.close()
+            continue
+        timer = dnf.logging.Timer('search index: %s' % repo.id)
+        try:
+            _RepoIndex.build(path, key, _repo_packages(base, repo))
+        except (IOError, OSError, sqlite.DatabaseError) as e:
+            logger.debug('search index %s not written: %s', path, ucd(e))
+        timer()
@@ -28,6 +28,7 @@ from functools import reduce
 import dnf
 import dnf.const
 import dnf.pycomp
+import importlib
 import itertools
 import librepo
 import logging
@@ -37,6 +38,7 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 
 logger = logging.getLogger('dnf')
@@ -78,6 +80,59 @@ def _urlopen(url, conf=None, repo=None, mode='w+b', **kwargs):
     return fo
 
 
+def _concurrent_map(fn, iterable, jobs):
+    """Like map(), but call `fn` from at most `jobs` threads at once.
+
+    Returns a list of (result, exception) pairs in the order of `iterable`,
+    the exception is None for calls that succeeded.
+
+    The calling thread keeps taking signals while it waits. If the wait is
+    interrupted, e.g. by KeyboardInterrupt, no more calls are started and the
+    exception propagates at once, the calls in progress are left to their
+    daemon threads.
+
+    """
+    items = list(iterable)
+    results = [None] * len(items)
+    work = iter(enumerate(items))
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def worker():
+        while not stopped.is_set():
+            with lock:
+                try:
+                    (i, item) = next(work)
+                except StopIteration:
+                    return
+            try:
+                results[i] = (fn(item), None)
+            except Exception as e:
+                results[i] = (None, e)
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(jobs, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        for thread in threads:
+            # join() without a timeout holds the signals off until it returns
+            while thread.is_alive():
+                thread.join(0.1)
+    except BaseException:
+        stopped.set()
+        raise
+    return results
+
+
+def _online_cpus():
+    try:
+        return os.sysconf('SC_NPROCESSORS_ONLN')
+    except (ValueError, OSError):
+        return 4
+
+
 def rtrim(s, r):
     if s.endswith(r):
         s = s[:-len(r)]
@@ -292,6 +347,16 @@ def _terminal_messenger(tp='write', msg="", out=sys.stdout):
         pass
 
 
+class _LazyModule(object):
+    """Stands in for a module imported on the first use of its attributes."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+
 class tmpdir(object):
     def __init__(self):
         prefix = '%s-' % dnf.const.PREFIX
@@ -813,6 +813,10 @@ class YumHistory(object):
         return self._conn.cursor()
     def _commit(self):
         return self._conn.commit()
+    def commit(self):
+        """Commit the changes logged with commit=False."""
+        if self._conn is not None:
+            self._commit()
     def _rollback(self):
         return self._conn.rollback()
 
@@ -907,7 +911,7 @@ class YumHistory(object):
                          (tid, pkgtupid, state)
                          VALUES (?, ?, ?)""", (self._tid, pid, state))
         return cur.lastrowid
-    def trans_data_pid_end(self, pid, state):
+    def trans_data_pid_end(self, pid, state, commit=True):
         # State can be none here, Eg. TS_FAILED from rpmtrans
         if not hasattr(self, '_tid') or state is None:
             return # Not configured to run
@@ -919,7 +923,8 @@ class YumHistory(object):
                          """UPDATE trans_data_pkgs SET done = ?
                          WHERE tid = ? AND pkgtupid = ? AND state = ?
                          """, ('TRUE', self._tid, pid, state))
-        self._commit()
+        if commit:
+            self._commit()
 
     def _trans_rpmdb_problem(self, problem):
         if not hasattr(self, '_tid'):
@@ -1019,7 +1024,7 @@ class YumHistory(object):
                           (tid, msg) VALUES (?, ?)""", (self._tid, error))
         self._commit()
 
-    def log_scriptlet_output(self, msg):
+    def log_scriptlet_output(self, msg, commit=True):
         if msg is None or not hasattr(self, '_tid'):
             return # Not configured to run
 
@@ -1031,7 +1036,8 @@ class YumHistory(object):
             executeSQL(cur,
                        """INSERT INTO trans_script_stdout
                           (tid, line) VALUES (?, ?)""", (self._tid, error))
-        self._commit()
+        if commit:
+            self._commit()
 
     def _load_errors(self, tid):
         cur = self._get_cursor()
@@ -1410,6 +1416,44 @@ class YumHistory(object):
         self._commit()
         return True
 
+    def sync_alldb_many(self, ipkgs):
+        """ Sync. all the data for rpmdb/yumdb for these installed pkgs, in
+            one DB transaction. """
+        cur = self._get_cursor()
+        if cur is None or not self._update_db_file_3():
+            return False
+
+        pids = []
+        rows = {'rpm' : [], 'yum' : []}
+        yumdb_infos = self.yumdb.get_many(ipkgs)
+        for ipkg in ipkgs:
+            yumdb_info = yumdb_infos[ipkg]
+            csum = None
+            if 'checksum_type' in yumdb_info and 'checksum_data' in yumdb_info:
+                csum = "%s:%s" % (yumdb_info.checksum_type,
+                                  yumdb_info.checksum_data)
+            pid = self._pkgtup2pid(ipkg.pkgtup, csum, create=False)
+            if pid is None:
+                continue
+            pids.append((pid,))
+            for attr in YumHistoryPackage._valid_rpmdb_keys:
+                val = getattr(ipkg, attr, None)
+                if val is not None:
+                    rows['rpm'].append((pid, attr, ucd(val)))
+            for attr in _YumHistPackageYumDB._valid_yumdb_keys:
+                val = yumdb_info.get(attr)
+                if val is not None:
+                    rows['yum'].append((pid, attr, ucd(val)))
+
+        for db in ('rpm', 'yum'):
+            cur.executemany("""DELETE FROM pkg_%(db)sdb
+                               WHERE pkgtupid=?""" % {'db' : db}, pids)
+            cur.executemany("""INSERT INTO pkg_%(db)sdb
+                               (pkgtupid, %(db)sdb_key, %(db)sdb_val)
+                               VALUES (?, ?, ?)""" % {'db' : db}, rows[db])
+        self._commit()
+        return True
+
     def _pkg_stats(self):
         """ Some stats about packages in the DB. """
 
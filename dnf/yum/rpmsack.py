@@ -15,14 +15,23 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from . import misc
+from .sqlutils import sqlite, executeSQL
+from dnf.i18n import ucd
+import contextlib
 import dnf.pycomp
+import dnf.util
 import glob
 import logging
 import os
 import rpm
+import time
 
 logger = logging.getLogger('dnf')
 
+_INDEX_FILENAME = 'index.sqlite'
+# stay well below the SQLite limit on the number of host parameters
+_INDEX_SELECT_CHUNK = 500
+
 # For returnPackages(patterns=)
 flags = {"GT": rpm.RPMSENSE_GREATER,
          "GE": rpm.RPMSENSE_EQUAL | rpm.RPMSENSE_GREATER,
@@ -75,6 +84,236 @@ def _sanitize(path):
     return path.replace('/', '').replace('~', '')
 
 
+class _YumdbIndex(object):
+    """ SQLite index of the yumdb directory tree.
+
+        Reads are answered from the index, the tree is still written so that
+        other tools reading it keep working and the index can always be
+        rebuilt from it. The index of a package is only trusted while the
+        stat data of its directory, which change whenever a file is put into
+        it or removed from it, are the ones recorded with it. """
+
+    _CREATE_OPS = {'attrs' : '''\
+ CREATE TABLE attrs (
+     pkgkey TEXT NOT NULL, attr TEXT NOT NULL, value TEXT NOT NULL,
+     PRIMARY KEY (pkgkey, attr));
+''', 'dirs' : '''\
+ CREATE TABLE dirs (pkgkey TEXT PRIMARY KEY, stamp TEXT NOT NULL);
+''', 'meta' : '''\
+ CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+'''}
+
+    def __init__(self, db_path, writable):
+        self._db_path = db_path
+        self._db_file = os.path.join(db_path, _INDEX_FILENAME)
+        self._writable = writable
+        self._conn = None
+        self._batch_depth = 0
+        self.usable = self._connect()
+
+    def _connect(self):
+        if not os.path.exists(self._db_file):
+            if not self._writable:
+                return False
+            oumask = os.umask(0o22)
+            try:
+                os.close(os.open(self._db_file, os.O_CREAT, 0o644))
+            finally:
+                os.umask(oumask)
+        try:
+            self._conn = sqlite.connect(self._db_file)
+            cur = self._conn.cursor()
+            executeSQL(cur, "PRAGMA synchronous = NORMAL")
+            executeSQL(cur, "SELECT name FROM sqlite_master WHERE type='table'")
+            tables = set(row[0] for row in cur)
+            if tables.issuperset(self._CREATE_OPS):
+                executeSQL(cur, "SELECT value FROM meta WHERE key='migrated'")
+                if cur.fetchone() is not None:
+                    return True
+        except sqlite.DatabaseError as e:
+            logger.debug('yumdb index %s unusable: %s', self._db_file, ucd(e))
+            self.close()
+            if not self._writable:
+                return False
+            misc.unlink_f(self._db_file)
+            return self._connect()
+        if not self._writable:
+            self.close()
+            return False
+        self._migrate(tables)
+        return True
+
+    def _migrate(self, tables):
+        """ One-time import of the whole directory tree. """
+        cur = self._conn.cursor()
+        for (table, op) in self._CREATE_OPS.items():
+            if table not in tables:
+                cur.execute(op)
+        rows = []
+        stamps = []
+        for pkgdir in glob.glob(self._db_path + '/*/*'):
+            if pkgdir.endswith('.tmp'):
+                continue
+            key = os.path.basename(pkgdir)
+            stamp = self._stamp(pkgdir)
+            if stamp is None:
+                continue
+            rows.extend((key, attr, value) for (attr, value)
+                        in self._read_dir(pkgdir).items())
+            stamps.append((key, stamp))
+        executeSQL(cur, "DELETE FROM attrs")
+        cur.executemany("INSERT INTO attrs VALUES (?, ?, ?)", rows)
+        cur.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?)", stamps)
+        executeSQL(cur, "INSERT OR REPLACE INTO meta VALUES ('migrated', ?)",
+                   (str(int(time.time())),))
+        self._bump_generation(cur)
+        self._conn.commit()
+        logger.debug('yumdb index: imported %d attributes.', len(rows))
+
+    @staticmethod
+    def _read_dir(pkgdir):
+        attrs = {}
+        try:
+            items = os.listdir(pkgdir)
+        except OSError:
+            return attrs
+        for item in items:
+            if item.endswith('.tmp'):
+                continue
+            fo, e = _iopen(os.path.join(pkgdir, item))
+            if fo is None:
+                continue
+            attrs[item] = ucd(fo.read())
+            fo.close()
+        return attrs
+
+    @staticmethod
+    def _stamp(pkgdir):
+        """ Return the stat data of the package dir, None if it is missing. """
+        try:
+            st = os.stat(pkgdir)
+        except OSError:
+            return None
+        return '%r %d %d' % (st.st_mtime, st.st_ino, st.st_nlink)
+
+    @staticmethod
+    def _bump_generation(cur):
+        executeSQL(cur, """INSERT OR REPLACE INTO meta VALUES ('generation',
+                           COALESCE((SELECT value FROM meta
+                                     WHERE key='generation'), 0) + 1)""")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def generation(self):
+        """ Number that changes with every modification of the index. """
+        cur = self._conn.cursor()
+        executeSQL(cur, "SELECT value FROM meta WHERE key='generation'")
+        row = cur.fetchone()
+        return 0 if row is None else int(row[0])
+
+    def get(self, pkgdirs):
+        """ Return a dict mapping the keys of the given package dirs to dicts
+            of their attributes. Packages not indexed yet, or changed in the
+            tree since, are imported from the tree. """
+        keys = dict((os.path.basename(pkgdir), pkgdir) for pkgdir in pkgdirs)
+        found = {}
+        stamps = {}
+        cur = self._conn.cursor()
+        pending = list(keys)
+        for i in range(0, len(pending), _INDEX_SELECT_CHUNK):
+            chunk = pending[i:i + _INDEX_SELECT_CHUNK]
+            marks = ','.join('?' * len(chunk))
+            sql = "SELECT pkgkey, attr, value FROM attrs WHERE pkgkey IN (%s)"
+            executeSQL(cur, sql % marks, chunk)
+            for (key, attr, value) in cur:
+                found.setdefault(key, {})[attr] = value
+            sql = "SELECT pkgkey, stamp FROM dirs WHERE pkgkey IN (%s)"
+            executeSQL(cur, sql % marks, chunk)
+            stamps.update(cur)
+        with self.batch():
+            for (key, pkgdir) in keys.items():
+                stamp = self._stamp(pkgdir)
+                if stamp is None:
+                    if key in stamps or key in found:
+                        self.delete(key)
+                    found[key] = {}
+                elif stamps.get(key) != stamp:
+                    found[key] = self._import(key, pkgdir, stamp)
+                else:
+                    found.setdefault(key, {})
+        return found
+
+    def _import(self, key, pkgdir, stamp):
+        attrs = self._read_dir(pkgdir)
+        if self._writable:
+            cur = self._conn.cursor()
+            executeSQL(cur, "DELETE FROM attrs WHERE pkgkey=?", (key,))
+            cur.executemany(
+                "INSERT INTO attrs VALUES (?, ?, ?)",
+                [(key, attr, value) for (attr, value) in attrs.items()])
+            executeSQL(cur, "INSERT OR REPLACE INTO dirs VALUES (?, ?)",
+                       (key, stamp))
+            self._bump_generation(cur)
+            self._commit()
+        return attrs
+
+    def stamp(self, key, pkgdir):
+        """ Record that the index of the package matches its dir. """
+        stamp = self._stamp(pkgdir)
+        if not self._writable or stamp is None:
+            return
+        cur = self._conn.cursor()
+        executeSQL(cur, "INSERT OR REPLACE INTO dirs VALUES (?, ?)",
+                   (key, stamp))
+        self._commit()
+
+    def set(self, key, attr, value):
+        if not self._writable:
+            return
+        cur = self._conn.cursor()
+        executeSQL(cur, "INSERT OR REPLACE INTO attrs VALUES (?, ?, ?)",
+                   (key, attr, ucd(value)))
+        self._bump_generation(cur)
+        self._commit()
+
+    def delete(self, key, attr=None):
+        if not self._writable:
+            return
+        cur = self._conn.cursor()
+        if attr is None:
+            executeSQL(cur, "DELETE FROM attrs WHERE pkgkey=?", (key,))
+            executeSQL(cur, "DELETE FROM dirs WHERE pkgkey=?", (key,))
+        else:
+            executeSQL(cur, "DELETE FROM attrs WHERE pkgkey=? AND attr=?",
+                       (key, attr))
+        self._bump_generation(cur)
+        self._commit()
+
+    def _commit(self):
+        if not self._batch_depth:
+            self._conn.commit()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ Commit all the writes done in the block at once. """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._conn is not None:
+                self._conn.commit()
+
+
+@contextlib.contextmanager
+def _no_batch():
+    yield
+
+
 class AdditionalPkgDB(object):
     """ Accesses additional package data rpmdb is unable to store.
 
@@ -102,6 +341,13 @@ class AdditionalPkgDB(object):
             if os.access(self.conf.db_path, os.W_OK):
                 self.conf.writable = True
         self.yumdb_cache = {'attr' : {}}
+        # package dir -> (package, attributes) written at the end of a batch
+        self._pending = None
+        self._index = None
+        if os.path.isdir(self.conf.db_path):
+            self._index = _YumdbIndex(self.conf.db_path, self.conf.writable)
+            if not self._index.usable:
+                self._index = None
 
     def _get_dir_name(self, pkgtup, pkgid):
         if pkgid in self._packages:
@@ -128,7 +374,54 @@ class AdditionalPkgDB(object):
             raise ValueError("Missing arguments.")
 
         return RPMDBAdditionalDataPackage(self.conf, thisdir,
-                                          yumdb_cache=self.yumdb_cache)
+                                          yumdb_cache=self.yumdb_cache,
+                                          index=self._index,
+                                          pending=self._pending)
+
+    def get_many(self, pos):
+        """Return a dict mapping the packages to RPMDBAdditionalDataPackage
+           Objects, fetching the indexed data of all of them at once."""
+        dirs = dict((po, self._get_dir_name(po.pkgtup, po._pkgid))
+                    for po in pos)
+        indexed = {}
+        if self._index is not None:
+            indexed = self._index.get(dirs.values())
+        return dict((po, RPMDBAdditionalDataPackage(
+            self.conf, thisdir, yumdb_cache=self.yumdb_cache,
+            index=self._index,
+            indexed=indexed.get(os.path.basename(thisdir)),
+            pending=self._pending))
+                    for (po, thisdir) in dirs.items())
+
+    @property
+    def generation(self):
+        """ Number changing with the stored data, None if it can't be told. """
+        if self._index is None:
+            return None
+        return self._index.generation
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ Write all the changes done in the block at once: the index in a
+            single commit, the tree one package directory after another. """
+        if self._pending is not None:
+            yield
+            return
+        self._pending = pending = {}
+        index_batch = _no_batch() if self._index is None else \
+            self._index.batch()
+        with index_batch:
+            try:
+                yield
+            finally:
+                self._pending = None
+                for (po, attrs) in pending.values():
+                    po._write_attrs(attrs)
+                    po._index_stamp()
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
 
 
 class RPMDBAdditionalDataPackage(object):
@@ -140,12 +433,19 @@ class RPMDBAdditionalDataPackage(object):
                                 'from_repo_timestamp', 'releasever',
                                 'command_line'])
 
-    def __init__(self, conf, pkgdir, yumdb_cache=None):
+    def __init__(self, conf, pkgdir, yumdb_cache=None, index=None,
+                 indexed=None, pending=None):
         self._conf = conf
         self._mydir = pkgdir
+        # the batch of the db the writes are queued in
+        self._pending = pending
 
         self._read_cached_data = {}
 
+        # attributes from the yumdb index, loaded on first access if not given
+        self._index = index
+        self._indexed = indexed
+
         #  'from_repo' is the most often requested piece of data, and is often
         # the same for a huge number of packages. So we use hardlinks to share
         # data, and try to optimize for that.
@@ -192,67 +492,113 @@ class RPMDBAdditionalDataPackage(object):
                     del self._yumdb_cache['attr'][ovalue]
             del self._yumdb_cache[fn]
 
-    def _link_yumdb_cache(self, fn, value):
-        """ If we have a matching yumdb cache, link() to it instead of having
-            to open()+write(). """
-        if self._yumdb_cache is None:
-            return False
-
-        self._unlink_yumdb_cache(fn)
-
-        if value not in self._yumdb_cache['attr']:
-            return False
-
-        assert self._yumdb_cache['attr'][value][2]
-        try:
-            lfn = next(iter(self._yumdb_cache['attr'][value][2]))
-            misc.unlink_f(fn + '.tmp')
-            os.link(lfn, fn + '.tmp')
-            os.rename(fn + '.tmp', fn)
-        except:
-            return False
-
-        self._yumdb_cache['attr'][value][2].add(fn)
-        self._yumdb_cache[fn] = value
-
-        return True
+    def _indexed_attrs(self):
+        """ Return the indexed attributes, empty if the package is not in the
+            index. """
+        if self._index is None:
+            return {}
+        if self._indexed is None:
+            key = os.path.basename(self._mydir)
+            self._indexed = self._index.get([self._mydir])[key]
+        return self._indexed
 
     def _attr2fn(self, attr):
         """ Given an attribute, return the filename. """
         return os.path.normpath(self._mydir + '/' + attr)
 
     def _write(self, attr, value):
-        # check for self._conf.writable before going on?
-        if not os.path.exists(self._mydir):
-            _makedirs_no_umask(self._mydir)
-
         attr = _sanitize(attr)
-        if attr in self._read_cached_data:
-            del self._read_cached_data[attr]
-        fn = self._attr2fn(attr)
-
         if attr.endswith('.tmp'):
             raise AttributeError("Cannot set attribute %s on %s" % (attr, self))
 
-        # Auto hardlink some of the attrs...
-        if self._link_yumdb_cache(fn, value):
+        if self._pending is not None:
+            self._read_cached_data[attr] = value
+            attrs = self._pending.setdefault(self._mydir, (self, {}))[1]
+            attrs[attr] = value
+            self._index_write(attr, value)
+        else:
+            self._write_attrs({attr: value})
+            self._index_write(attr, value)
+            self._index_stamp()
+
+    def _write_attrs(self, attrs):
+        """ Write the attributes into the tree. A new package directory is
+            written aside and moved into place as a whole. """
+        # check for self._conf.writable before going on?
+        for attr in attrs:
+            self._read_cached_data.pop(attr, None)
+        if os.path.exists(self._mydir):
+            for (attr, value) in attrs.items():
+                fn = self._attr2fn(attr)
+                self._cache_written(attr, fn, value, self._write_file(fn, value))
             return
 
-        # Default write()+rename()... hardlink -c can still help.
-        misc.unlink_f(fn + '.tmp')
+        tmpdir = self._mydir + '.tmp'
+        dnf.util.rm_rf(tmpdir)
+        _makedirs_no_umask(tmpdir)
+        linked = dict((attr, self._write_file(os.path.join(tmpdir, attr),
+                                              value, atomic=False))
+                      for (attr, value) in attrs.items())
+        os.rename(tmpdir, self._mydir)
+        for (attr, value) in attrs.items():
+            self._cache_written(attr, self._attr2fn(attr), value, linked[attr])
+
+    def _write_file(self, fn, value, atomic=True):
+        """ Write the value into fn, return whether it was hardlinked to a file
+            holding the same value. """
+        tmp_fn = fn + '.tmp' if atomic else fn
+        misc.unlink_f(tmp_fn)
+
+        # Auto hardlink some of the attrs...
+        if self._yumdb_cache is not None and \
+           value in self._yumdb_cache['attr']:
+            lfn = next(iter(self._yumdb_cache['attr'][value][2]))
+            try:
+                os.link(lfn, tmp_fn)
+                if atomic:
+                    os.rename(tmp_fn, fn)
+                return True
+            except (IOError, OSError):
+                misc.unlink_f(tmp_fn)
 
-        fo = _open_no_umask(fn + '.tmp', 'w')
+        # Default write()+rename()... hardlink -c can still help.
+        fo = _open_no_umask(tmp_fn, 'w')
         try:
             dnf.pycomp.write_to_file(fo, value)
         except (OSError, IOError) as e:
-            logger.error("Cannot set attribute %s on %s due to:  %s" % (attr, self, e.strerror))
+            logger.error("Cannot set attribute %s on %s due to:  %s" % (os.path.basename(fn), self, e.strerror))
 
         fo.flush()
         fo.close()
         del fo
-        os.rename(fn +  '.tmp', fn) # even works on ext4 now!:o
+        if atomic:
+            os.rename(tmp_fn, fn) # even works on ext4 now!:o
+        return False
+
+    def _cache_written(self, attr, fn, value, linked):
+        if self._yumdb_cache is None:
+            self._read_cached_data[attr] = value
+            return
+        self._unlink_yumdb_cache(fn)
+        if linked and value in self._yumdb_cache['attr']:
+            self._read_cached_data[attr] = value
+            self._yumdb_cache['attr'][value][2].add(fn)
+            self._yumdb_cache[fn] = value
+        else:
+            self._auto_cache(attr, value, fn)
 
-        self._auto_cache(attr, value, fn)
+    def _index_write(self, attr, value):
+        if self._index is None:
+            return
+        # make sure the rest of the package is indexed before adding to it:
+        self._indexed_attrs()[attr] = ucd(value)
+        self._index.set(os.path.basename(self._mydir), attr, value)
+
+    def _index_stamp(self):
+        """ Tell the index our own writes brought it up to date with the
+            tree. """
+        if self._index is not None:
+            self._index.stamp(os.path.basename(self._mydir), self._mydir)
 
     def _read(self, attr):
         attr = _sanitize(attr)
@@ -264,6 +610,10 @@ class RPMDBAdditionalDataPackage(object):
         if attr.endswith('.tmp'):
             raise AttributeError("%s has no attribute %s" % (self, attr))
 
+        indexed = self._indexed_attrs()
+        if attr in indexed:
+            return indexed[attr]
+
         info = misc.stat_f(fn, ignore_EACCES=True)
         if info is None:
             raise AttributeError("%s has no attribute %s" % (self, attr))
@@ -295,11 +645,15 @@ class RPMDBAdditionalDataPackage(object):
         if attr in self._read_cached_data:
             del self._read_cached_data[attr]
         self._unlink_yumdb_cache(fn)
+        if self._index is not None and \
+           self._indexed_attrs().pop(attr, None) is not None:
+            self._index.delete(os.path.basename(self._mydir), attr)
         if os.path.exists(fn):
             try:
                 os.unlink(fn)
             except (IOError, OSError) as e:
                 logger.error("Cannot delete attribute %s on %s at %s due to: %s" % (attr, self, fn, e.strerror))
+            self._index_stamp()
 
     def __getattr__(self, attr):
         return self._read(attr)
@@ -326,6 +680,12 @@ class RPMDBAdditionalDataPackage(object):
     def __iter__(self, show_hidden=False):
         for item in self._read_cached_data:
             yield item
+        indexed = self._indexed_attrs()
+        if indexed and not show_hidden:
+            for item in list(indexed):
+                if item not in self._read_cached_data:
+                    yield item
+            return
         for item in glob.glob(self._mydir + '/*'):
             item = item[(len(self._mydir) + 1):]
             if item in self._read_cached_data:
@@ -336,6 +696,9 @@ class RPMDBAdditionalDataPackage(object):
 
     def clean(self):
         # purge out everything
+        if self._index is not None:
+            self._index.delete(os.path.basename(self._mydir))
+            self._indexed = {}
         for item in self.__iter__(show_hidden=True):
             self._delete(item)
         try:
@@ -18,6 +18,7 @@ from __future__ import print_function, absolute_import
 from __future__ import unicode_literals
 from dnf.i18n import _, ucd
 from dnf.pycomp import basestring
+import dnf.logging
 import dnf.transaction
 import dnf.util
 import rpm
@@ -43,6 +44,11 @@ TS_FAILED = 100
 TS_INSTALL_STATES = [TS_INSTALL, TS_UPDATE, TS_OBSOLETING]
 TS_REMOVE_STATES = [TS_ERASE, TS_OBSOLETED, TS_UPDATED]
 
+# the history and the ts_done file are synced after this many elements or
+# seconds, whichever comes first
+JOURNAL_BATCH = 32
+JOURNAL_INTERVAL = 2.0
+
 logger = logging.getLogger('dnf')
 
 
@@ -174,6 +180,12 @@ class RPMTransaction(object):
         # Index in _te_list of the transaction element being processed (for use
         # in callbacks)
         self._te_index = 0
+        # NEVRA -> (pkg, history state, tsi) of the removed packages
+        self._erased = None
+        self._cb_count = 0
+        self._cb_time = 0.0
+        self._journal_pending = 0
+        self._journal_time = time.time()
 
     def _fdSetCloseOnExec(self, fd):
         """ Set the close on exec. flag for a filedescriptor. """
@@ -222,7 +234,36 @@ class RPMTransaction(object):
         msgs = self._scriptOutput()
         for display in self.displays:
             display.scriptout(msgs)
-        self.base.history.log_scriptlet_output(msgs)
+        self.base.history.log_scriptlet_output(msgs, commit=False)
+
+    def _journal(self):
+        """Note a finished element, syncing the journal once in a while."""
+        self._journal_pending += 1
+        if (self._journal_pending >= JOURNAL_BATCH or
+                time.time() - self._journal_time >= JOURNAL_INTERVAL):
+            self._journal_flush()
+
+    def _journal_flush(self):
+        self._journal_pending = 0
+        self._journal_time = time.time()
+        self.base.history.commit()
+        if self._ts_done is None:
+            return
+        try:
+            self._ts_done.flush()
+            os.fdatasync(self._ts_done.fileno())
+        except (IOError, OSError) as e:
+            self._ts_done_failed(e)
+
+    def close(self):
+        """Sync the journal once the transaction is over."""
+        self._journal_flush()
+        if self._ts_done is not None:
+            self._ts_done.close()
+            self._ts_done = None
+        logger.log(dnf.logging.DDEBUG,
+                   'transaction callbacks: %d calls, %d ms', self._cb_count,
+                   self._cb_time * 1000)
 
     def __del__(self):
         self._shutdownOutputLogging()
@@ -235,19 +276,24 @@ class RPMTransaction(object):
             return cbkey._active, cbkey._active_history_state, cbkey
 
         # We don't have the tsi, let's look it up (only happens on erasures)
+        if self._erased is None:
+            self._erased = self._erased_map()
         te = self._te_list[self._te_index]
-        obsoleted = obsoleted_state = obsoleted_tsi = None
+        return self._erased.get(te.NEVRA(), (None, None, None))
+
+    def _erased_map(self):
+        """Map NEVRAs of the removed packages to (pkg, history state, tsi)."""
+        erased = {}
+        obsoleted = {}
         for tsi in self.base.transaction:
-            # only walk the tsis once. prefer finding an erase over an obsoleted
-            # package:
-            if tsi.erased is not None and str(tsi.erased) == te.NEVRA():
-                return tsi.erased, tsi._erased_history_state, tsi
+            # prefer the first erase of a NEVRA over an obsoleted package:
+            if tsi.erased is not None:
+                erased.setdefault(str(tsi.erased),
+                                  (tsi.erased, tsi._erased_history_state, tsi))
             for o in tsi.obsoleted:
-                if str(o) == te.NEVRA():
-                    obsoleted = o
-                    obsoleted_state = tsi._obsoleted_history_state
-                    obsoleted_tsi = tsi
-        return obsoleted, obsoleted_state, obsoleted_tsi
+                obsoleted[str(o)] = (o, tsi._obsoleted_history_state, tsi)
+        obsoleted.update(erased)
+        return obsoleted
 
     def _fn_rm_installroot(self, filename):
         """ Remove the installroot from the filename. """
@@ -289,14 +335,16 @@ class RPMTransaction(object):
 
         try:
             self._ts_done.write(msg)
-            self._ts_done.flush()
         except (IOError, OSError) as e:
-            #  Having incomplete transactions is probably worse than having
-            # nothing.
-            for display in self.displays:
-                display.error('could not write to ts_done file: %s' % e)
-            self._ts_done = None
-            misc.unlink_f(self.ts_done_fn)
+            self._ts_done_failed(e)
+
+    def _ts_done_failed(self, e):
+        #  Having incomplete transactions is probably worse than having
+        # nothing.
+        for display in self.displays:
+            display.error('could not write to ts_done file: %s' % e)
+        self._ts_done = None
+        misc.unlink_f(self.ts_done_fn)
 
     def ts_done(self, package, action):
         """writes out the portions of the transaction which have completed"""
@@ -400,12 +448,18 @@ class RPMTransaction(object):
             self._ts_done = None
 
     def callback(self, what, amount, total, key, client_data):
+        start = time.time()
+        try:
+            return self._callback(what, amount, total, key)
+        finally:
+            self._cb_count += 1
+            self._cb_time += time.time() - start
+
+    def _callback(self, what, amount, total, key):
         if isinstance(key, str):
             key = ucd(key)
         if what == rpm.RPMCALLBACK_TRANS_START:
             self._transStart(total)
-        elif what == rpm.RPMCALLBACK_TRANS_STOP:
-            self._transStop()
         elif what == rpm.RPMCALLBACK_ELEM_PROGRESS:
             # This callback type is issued every time the next transaction
             # element is about to be processed by RPM, before any other
@@ -436,10 +490,7 @@ class RPMTransaction(object):
         self.ts_all() # write out what transaction will do
         self.ts_done_open()
         self._te_list = list(self.base._ts)
-
-    def _transStop(self):
-        if self._ts_done is not None:
-            self._ts_done.close()
+        self._erased = self._erased_map()
 
     def _elemProgress(self, index):
         self._te_index = index
@@ -473,7 +524,8 @@ class RPMTransaction(object):
             display.filelog(pkg, action)
         self._scriptout()
         pid = self.base.history.pkg2pid(pkg)
-        self.base.history.trans_data_pid_end(pid, state)
+        self.base.history.trans_data_pid_end(pid, state, commit=False)
+        self._journal()
         # :dead
         # self.ts_done(txmbr.po, txmbr.output_state)
 
@@ -519,7 +571,7 @@ class RPMTransaction(object):
             if _do_chroot and self.base.conf.installroot != '/':
                 os.chroot(".")
             pid   = self.base.history.pkg2pid(pkg)
-            self.base.history.trans_data_pid_end(pid, state)
+            self.base.history.trans_data_pid_end(pid, state, commit=False)
             if _do_chroot and self.base.conf.installroot != '/':
                 os.chroot(self.base.conf.installroot)
             # :dead
@@ -528,6 +580,7 @@ class RPMTransaction(object):
             self._scriptout()
             # :dead
             # self.ts_done(name, action)
+        self._journal()
 
     def _cpioError(self, key):
         # In the case of a remove, we only have a name, not a tsi:
@@ -166,6 +166,38 @@ class UpdateInfoCommandTest(tests.support.TestCase):
             'incorrect pairs')
         cmd.clear_installed_cache()
 
+    def test_all_single_filter_pass(self):
+        """Test that the update filters are applied only once."""
+        cmd = dnf.cli.commands.updateinfo.UpdateInfoCommand(self.cli)
+        with tests.support.mock.patch.object(
+                self.cli.base, '_merge_update_filters',
+                wraps=self.cli.base._merge_update_filters) as merge:
+            cmd.refresh_installed_cache()
+            mixed, apkg_adv_insts = cmd.all_apkg_adv_insts()
+            self.assertLength(list(apkg_adv_insts), 3)
+        self.assertEqual(merge.call_count, 1)
+        cmd.clear_installed_cache()
+
+    def test_shared_advisory_id(self):
+        """Test advisories of the same ID from two repositories."""
+        mock = tests.support.mock
+        apkgs = [mock.Mock(evr='1-1', arch='noarch') for _ in range(3)]
+        for (apkg, name) in zip(apkgs, ('tour', 'tour-doc', 'pepper')):
+            apkg.name = name
+        base = mock.Mock(id='RHSA-1', packages=apkgs[:2])
+        optional = mock.Mock(id='RHSA-1', packages=apkgs[1:])
+        package = mock.Mock()
+        package.get_advisories.return_value = [base, optional]
+        cmd = dnf.cli.commands.updateinfo.UpdateInfoCommand(self.cli)
+        with mock.patch.object(cmd, '_newer_equal_installed',
+                               return_value=False):
+            triplets = cmd._apackage_advisory_installeds(
+                [package, package], hawkey.GT, lambda apkg: True)
+            self.assertCountEqual(
+                ((apkg.name, adv) for (apkg, adv, _) in triplets),
+                [('tour', base), ('tour-doc', base),
+                 ('tour-doc', optional), ('pepper', optional)])
+
     def test_display_list_mixed(self):
         """Test list displaying with mixed installs."""
         apkg_adv_insts = itertools.chain(
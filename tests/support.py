@@ -33,6 +33,7 @@ import dnf.persistor
 import dnf.pycomp
 import dnf.repo
 import dnf.sack
+import dnf.yum.history
 import dnf.yum.rpmsack
 import hawkey
 import hawkey.test
@@ -430,10 +431,18 @@ class MockYumDB(mock.Mock):
     def __init__(self):
         super(mock.Mock, self).__init__()
         self.db = {}
+        self.generation = None
 
     def get_package(self, pkg):
         return self.db.setdefault(str(pkg), mock.Mock())
 
+    def get_many(self, pkgs):
+        return {pkg: self.get_package(pkg) for pkg in pkgs}
+
+    @contextlib.contextmanager
+    def batch(self):
+        yield
+
     def assertLength(self, length):
         assert len(self.db) == length
 
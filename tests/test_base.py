@@ -25,6 +25,7 @@ import binascii
 import dnf
 import dnf.exceptions
 import dnf.package
+import dnf.rpm
 import dnf.subject
 import dnf.transaction
 import hawkey
@@ -165,10 +166,17 @@ class VerifyTransactionTest(TestCase):
         new_pkg.repo = mock.Mock()
         removed_pkg = self.base.sack.query().available().filter(
             name="mrkite")[0]
+        hdr = dict.fromkeys(dnf.rpm._InstalledHeader._HISTORY_TAGS)
+        hdr.update(name=new_pkg.name, epoch=new_pkg.epoch,
+                   version=new_pkg.version, release=new_pkg.release,
+                   arch=new_pkg.arch, sha1header=new_pkg.name, dbinstance=1)
 
         self.base.transaction.add_install(new_pkg, [])
         self.base.transaction.add_erase(removed_pkg)
-        self.base._verify_transaction()
+        with mock.patch('dnf.rpm._installed_headers',
+                        return_value=[dnf.rpm._InstalledHeader(hdr)]) as hdrs:
+            self.base._verify_transaction()
+        self.assertCountEqual(hdrs.call_args[0][1], ['pepper', 'mrkite'])
         # mock is designed so this returns the exact same mock object it did
         # during the method call:
         yumdb_info = self.base._yumdb.get_package(new_pkg)
@@ -217,7 +225,8 @@ class CompsTest(support.TestCase):
     @mock.patch('dnf.yum.misc.repo_gen_decompress', lambda x, y: x)
     def test_read_comps(self):
         base = support.MockBase("main")
-        base.repos['main'].metadata = mock.Mock(_comps_fn=support.COMPS_PATH)
+        base.repos['main'].metadata = mock.Mock(_comps_fn=support.COMPS_PATH,
+                                                _comps_checksum=None)
         base.read_comps()
         groups = base.comps.groups
         self.assertLength(groups, support.TOTAL_GROUPS)
@@ -22,7 +22,9 @@ from tests import support
 from tests.support import TestCase
 from tests.support import mock
 
+import dnf.callback
 import dnf.cli.cli
+import dnf.cli.commands.repoquery
 import dnf.conf
 import dnf.goal
 import dnf.repo
@@ -90,6 +92,41 @@ class BaseCliTest(support.ResultTestCase):
             mock.call.info('Package %s available, but not installed.', 'lotus'),
             mock.call.info('No match for argument: %s', 'lotus')])
 
+    def test_gpgsigcheck_key_import(self, logger):
+        pkgs = [mock.Mock(), mock.Mock(), mock.Mock()]
+        checkers = [mock.Mock(), mock.Mock()]
+        self._base.conf.assumeyes = True
+        self._base._sig_checker = mock.Mock(side_effect=checkers)
+        self._base._sig_check_pkg = mock.Mock(
+            side_effect=[(1, ''), (0, ''), (0, '')])
+        self._base._get_key_for_package = mock.Mock()
+
+        self._base.gpgsigcheck(pkgs)
+        # the packages after the key import are checked with the new key
+        self.assertEqual(self._base._sig_checker.mock_calls,
+                         [mock.call(pkgs), mock.call(pkgs[1:])])
+        self.assertEqual(self._base._sig_check_pkg.mock_calls,
+                         [mock.call(pkgs[0], checkers[0]),
+                          mock.call(pkgs[1], checkers[1]),
+                          mock.call(pkgs[2], checkers[1])])
+        self.assertEqual(checkers[0].close.mock_calls, [mock.call()])
+        self.assertEqual(checkers[1].close.mock_calls, [mock.call()])
+
+    def test_sig_check_progress(self, logger):
+        checker = mock.Mock()
+        progress = dnf.cli.cli._SigCheckProgress(None, checker)
+        rpm = mock.Mock(delta=None)
+        rpm.pkg.localPkg.return_value = 'rpm'
+        delta = mock.Mock()
+        delta.pkg.localPkg.return_value = 'drpm'
+        progress.end(rpm, dnf.callback.STATUS_FAILED, 'error')
+        progress.end(delta, dnf.callback.STATUS_OK, None)
+        self.assertEqual(checker.submit.mock_calls, [])
+        progress.end(rpm, dnf.callback.STATUS_OK, None)
+        progress.end(delta, dnf.callback.STATUS_DRPM, 'done')
+        self.assertEqual(checker.submit.mock_calls,
+                         [mock.call('rpm'), mock.call('drpm')])
+
 
 
 @mock.patch('dnf.cli.cli.Cli._read_conf_file')
@@ -104,6 +141,17 @@ class CliTest(TestCase):
         update = self.cli.cli_commands['update']
         self.assertIs(upgrade, update)
 
+    def test_lazy_commands(self, _):
+        lazy = [command for command in set(self.cli.cli_commands.values())
+                if isinstance(command, dnf.cli.commands._LazyCommand)]
+        self.assertLength(lazy, len(dnf.cli.cli._LAZY_COMMANDS))
+        for command in lazy:
+            self.assertCountEqual(command.aliases,
+                                  command._command_cls().aliases)
+        command = self.cli.cli_commands['repoquery'](self.cli)
+        self.assertIsInstance(command,
+                              dnf.cli.commands.repoquery.RepoQueryCommand)
+
     def test_simple(self, _):
         self.assertFalse(self.base.conf.assumeyes)
         self.cli.configure(['update', '-y'])
@@ -0,0 +1,106 @@
+# Copyright (C) 2016 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from tests import support
+from tests.support import mock
+
+import dnf.completion_cache
+import dnf.util
+import os
+import tempfile
+
+
+class CompletionCacheTest(support.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix='dnf-completioncachetest-')
+        repo = mock.Mock(id='main')
+        available = [support.MockPackage(nevra, repo) for nevra in
+                     ('pepper-20-0.x86_64', 'pepper-20-1.x86_64',
+                      'peppermint-1-1.noarch', 'lotus-3-16.x86_64')]
+        installed = [support.MockPackage('pepper-20-0.x86_64')]
+        self.base = mock.Mock()
+        self.base.conf.cachedir = self.path
+        self.base.conf.installroot = self.path
+        self.base.conf.config_file_path = os.path.join(self.path, 'dnf.conf')
+        self.base.conf.reposdir = [os.path.join(self.path, 'repos.d')]
+        self.base.sack.query().available.return_value = available
+        self.base.sack.query().installed.return_value = installed
+        self.signature = [['Packages', 1.5, 4096, 42]]
+        patcher = mock.patch('dnf.rpm._rpmdb_signature',
+                             side_effect=lambda root: self.signature)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        dnf.completion_cache.write(self.base)
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.path)
+
+    def test_lookup(self):
+        cache = dnf.completion_cache.load(self.path, self.path)
+        self.assertEqual(cache.available('pepper'),
+                         {'pepper-20-0.x86_64', 'pepper-20-1.x86_64',
+                          'peppermint-1-1.noarch'})
+        self.assertEqual(cache.available('pepper-'), set())
+        self.assertEqual(cache.installed('pe'), {'pepper-20-0.x86_64'})
+
+    def test_stale_config(self):
+        with open(self.base.conf.config_file_path, 'w') as conf:
+            conf.write('[main]\n')
+        cache_fn = os.path.join(self.path, 'completion.json')
+        os.utime(cache_fn, (0, 0))
+        self.assertIsNone(dnf.completion_cache.load(self.path, self.path))
+
+    def test_stale_rpmdb(self):
+        self.signature = [['Packages', 2.5, 4096, 42]]
+        self.assertIsNone(dnf.completion_cache.load(self.path, self.path))
+
+    def test_update_installed(self):
+        self.signature = [['Packages', 2.5, 4096, 42]]
+        installed = [support.MockPackage('pepper-20-1.x86_64')]
+        dnf.completion_cache.update_installed(self.base, installed)
+        cache = dnf.completion_cache.load(self.path, self.path)
+        self.assertEqual(cache.installed('pepper'), {'pepper-20-1.x86_64'})
+
+
+class CompleteTest(support.TestCase):
+    @mock.patch('dnf.completion_cache.load')
+    @mock.patch('dnf.conf.Conf')
+    def test_cachedir(self, conf, load):
+        conf().cachedir = '/var/cache/conf'
+        load().installed.return_value = {'pepper-20-0.x86_64'}
+        args = ['remove', 'pep', '-d', '0', '-q', '-C']
+        with mock.patch('sys.stdout'):
+            self.assertTrue(dnf.completion_cache.complete(args))
+        load.assert_called_with('/var/cache/conf')
+        conf().prepend_installroot.assert_called_with('cachedir')
+
+    @mock.patch('dnf.completion_cache.load')
+    def test_sack_options(self, load):
+        for opt in ('--installroot=/mnt', '--enablerepo=main', '-c'):
+            args = ['install', 'pep', opt, '-d', '0', '-q', '-C']
+            self.assertFalse(dnf.completion_cache.complete(args))
+        load.assert_not_called()
+
+    @mock.patch('dnf.completion_cache.load', return_value=None)
+    @mock.patch('dnf.conf.Conf')
+    def test_main_fallback(self, conf, load):
+        args = ['remove', 'pep', '-d', '0', '-q', '-C']
+        with mock.patch('dnf.cli.completion_helper.main') as helper_main:
+            dnf.completion_cache.main(args)
+        helper_main.assert_called_with(args)
@@ -29,6 +29,24 @@ import dnf.persistor
 import dnf.util
 import libcomps
 import operator
+import os
+import tempfile
+
+ARCH_COMPS_XML = """<comps>
+  <group>
+    <id>base</id>
+    <name>Base</name>
+    <packagelist>
+      <packagereq type="mandatory" arch="ppc64">tour</packagereq>
+      <packagereq type="default">pepper</packagereq>
+    </packagelist>
+  </group>
+  <group arch="s390x">
+    <id>s390</id>
+    <name>S390</name>
+  </group>
+</comps>
+"""
 
 TRANSLATION=u"""Tato skupina zahrnuje nejmenší možnou množinu balíčků. Je vhodná například na instalace malých routerů nebo firewallů."""
 
@@ -137,6 +155,58 @@ class CompsTest(support.TestCase):
         env = dnf.util.first(comps.environments_by_pattern('sugar-*'))
         self.assertEqual(env.ui_description, u'Software pro výuku o vyučování.')
 
+class CachedCompsTest(CompsTest):
+    """Runs the comps tests against the data loaded from the comps cache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='dnf_test_comps_')
+        cache_fn = os.path.join(self.tmpdir, 'main-comps.json')
+        comps = dnf.comps.Comps()
+        comps._add_from_xml_filename(support.COMPS_PATH, cache_fn, 'abc')
+        self.comps = dnf.comps.Comps()
+        self.assertFalse(self.comps._add_from_cache(cache_fn, 'def'))
+        self.assertTrue(self.comps._add_from_cache(cache_fn, 'abc'))
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.tmpdir)
+
+    def test_merge(self):
+        self.comps._add_from_xml_filename(support.COMPS_PATH)
+        self.assertLength(self.comps, 6)
+        g = self.comps._group_by_id('base')
+        self.assertCountEqual((pkg.name for pkg in g.packages),
+                              ('tour', 'pepper'))
+        self.assertIsNone(self.comps._group_by_id('nosuchgroup'))
+
+    def test_libcomps_data(self):
+        icomps = dnf.comps._parse_xml(support.COMPS_PATH)
+        icomps.langpacks['pepper'] = 'pepper-%s'
+        data = dnf.comps._dump_comps(icomps)
+        self.assertEqual(dnf.comps._load_comps(data).xml_str(),
+                         icomps.xml_str())
+
+    def test_blacklist_not_cached(self):
+        icomps = libcomps.Comps()
+        icomps.fromxml_str(
+            '<comps><blacklist><package name="tour"/></blacklist></comps>')
+        self.assertIsNone(dnf.comps._dump_comps(icomps))
+
+    def test_arches_not_cached(self):
+        xml_fn = os.path.join(self.tmpdir, 'arch-comps.xml')
+        with open(xml_fn, 'w') as xml:
+            xml.write(ARCH_COMPS_XML)
+        cache_fn = os.path.join(self.tmpdir, 'arch-comps.json')
+        comps = dnf.comps.Comps()
+        comps._add_from_xml_filename(xml_fn, cache_fn, 'abc')
+        self.assertFalse(os.path.exists(cache_fn))
+        self.assertFalse(dnf.comps.Comps()._add_from_cache(cache_fn, 'abc'))
+
+        comps._i = comps._i.arch_filter(['x86_64'])
+        g = comps._group_by_id('base')
+        self.assertCountEqual((pkg.name for pkg in g.packages), ('pepper',))
+        self.assertIsNone(comps._group_by_id('s390'))
+
+
 class PackageTest(support.TestCase):
     def test_instance(self):
         lc_pkg = libcomps.Package('weather', libcomps.PACKAGE_TYPE_OPTIONAL)
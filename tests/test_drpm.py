@@ -21,6 +21,7 @@ from tests import support, mock
 from dnf.yum.misc import unlink_f
 from dnf.util import Bunch
 
+import dnf.drpm
 import dnf.exceptions
 import os
 import shutil
@@ -53,6 +54,17 @@ class DrpmTest(support.TestCase):
         # there should be a delta from 5-0 to 5-1
         self.assertTrue(self.pkg.get_delta_from_evr('5-0'))
 
+    def test_delta_selection(self):
+        progress = mock.Mock()
+        info = dnf.drpm.DeltaInfo(self.base.sack.query().installed(),
+                                  progress, 200)
+        pload = info.delta_factory(self.pkg, progress)
+        self.assertEqual(pload.delta.location,
+                         self.pkg.get_delta_from_evr('5-0').location)
+        info.report_selection()
+        saving = self.pkg.downloadsize - pload.delta.downloadsize
+        progress.deltas_selected.assert_called_once_with(1, 1, saving)
+
     def download(self, errors=None, err={}):
         # utility function, calls Base.download_packages()
         # and returns the list of relative URLs it used.
@@ -92,3 +104,46 @@ class DrpmTest(support.TestCase):
 
         self.base.conf.deltarpm_percentage = 200
         self.assertEqual(self.download(), ['drpms/tour-5-1.noarch.drpm'])
+
+
+class DeltaInfoTest(support.TestCase):
+    def test_rebuild_largest_first(self):
+        info = dnf.drpm.DeltaInfo(None, mock.Mock(), 75, 1)
+        info.deltarpm = 0 # only queue, rebuild below
+        for size in (1, 3, 2):
+            info.enqueue(mock.Mock(_full_size=size))
+
+        rebuilt = []
+        def run_job(pload):
+            rebuilt.append(pload._full_size)
+            return 0, 0.5
+
+        info._workers = 1
+        with mock.patch.object(info, '_run_job', run_job),\
+                mock.patch('os.unlink'):
+            info._work()
+            info.wait()
+        self.assertEqual(rebuilt, [3, 2, 1])
+        self.assertEqual(len(info.progress.end.mock_calls), 3)
+        self.assertEqual(info.err, {})
+
+    def test_rebuild_error(self):
+        info = dnf.drpm.DeltaInfo(None, mock.Mock(), 75, 1)
+        info.deltarpm = 0 # only queue, rebuild below
+        failing, passing = mock.Mock(_full_size=2), mock.Mock(_full_size=1)
+        info.enqueue(failing)
+        info.enqueue(passing)
+
+        def run_job(pload):
+            if pload is failing:
+                raise OSError('spawn failed')
+            return 0, 0.5
+
+        info._workers = 1
+        with mock.patch.object(info, '_run_job', run_job),\
+                mock.patch('os.unlink'), mock.patch('dnf.drpm.unlink_f'):
+            info._work()
+            info.wait()
+        self.assertEqual(info._workers, 0)
+        self.assertEqual(list(info.err), [failing.pkg])
+        self.assertEqual(len(info.progress.end.mock_calls), 1)
@@ -22,7 +22,9 @@ from tests.support import TestCase
 from tests.support import mock
 
 import dnf.history
+import dnf.util
 import dnf.yum.history
+import tempfile
 
 class TestedHistory(dnf.yum.history.YumHistory):
     @mock.patch("os.path.exists", return_value=True)
@@ -56,6 +58,32 @@ class History(TestCase):
             self.history.pkg2pid(apkg)
             apkg2pid.assert_called_with(apkg, True)
 
+class HistorySyncTest(TestCase):
+    def setUp(self):
+        self.base = support.MockBase("main")
+        self.path = tempfile.mkdtemp(prefix='dnf-historytest-')
+        self.history = dnf.yum.history.YumHistory(self.path, self.base._yumdb)
+
+    def tearDown(self):
+        self.history.close()
+        dnf.util.rm_rf(self.path)
+
+    def test_sync_alldb_many(self):
+        pkgs = self.base.sack.query().installed().filter(name="pepper")
+        pkgs = pkgs.run()
+        for pkg in pkgs:
+            yumdb_info = support.RPMDBAdditionalDataPackageStub()
+            yumdb_info.from_repo = 'main'
+            self.base._yumdb.db[str(pkg)] = yumdb_info
+            self.history.pkg2pid(pkg)
+        with mock.patch.object(self.history, '_commit') as commit:
+            self.assertTrue(self.history.sync_alldb_many(pkgs))
+        commit.assert_called_once_with()
+        for pkg in pkgs:
+            self.assertEqual(self.history._load_yumdb_key(pkg, 'from_repo'),
+                             'main')
+
+
 class HistoryWrapperTest(support.TestCase):
     """Unit tests of dnf.history._HistoryWrapper."""
 
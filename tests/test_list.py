@@ -18,6 +18,8 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from tests import support
+from tests.support import mock
+
 import itertools
 
 
@@ -52,6 +54,24 @@ class List(support.TestCase):
 
         self.assertCountEqual(lists.installed, expected)
 
+    def test_list_reponame_shared_origins(self):
+        """Test that the listings share the origins of the packages."""
+        base = support.MockBase()
+        names = {'pepper', 'librita'}
+        for pkg in base.sack.query().installed():
+            origin = 'main' if pkg.name in names else 'updates'
+            base._yumdb.db[str(pkg)] = {'from_repo': origin}
+        expected = base.sack.query().installed().filter(name=names)
+
+        with mock.patch.object(base._yumdb, 'get_many',
+                               wraps=base._yumdb.get_many) as get_many:
+            installed = base._do_package_lists('installed', reponame='main')
+            everything = base._do_package_lists('all', reponame='main')
+
+        self.assertEqual(get_many.call_count, 1)
+        self.assertCountEqual(installed.installed, expected)
+        self.assertCountEqual(everything.installed, expected)
+
     def test_list_updates(self):
         base = support.MockBase("updates", "main")
         ypl = base._do_package_lists('upgrades')
@@ -62,8 +62,8 @@ class OtherProcess(ConcurrencyMixin, multiprocessing.Process):
 TARGET = os.path.join(tests.support.USER_RUNDIR, 'unit-test.pid')
 
 
-def build_lock(blocking=False):
-    return dnf.lock.ProcessLock(TARGET, 'unit-tests', blocking)
+def build_lock(blocking=False, shared=False):
+    return dnf.lock.ProcessLock(TARGET, 'unit-tests', blocking, shared)
 
 
 class LockTest(tests.support.TestCase):
@@ -97,6 +97,30 @@ class ProcessLockTest(tests.support.TestCase):
             with l1:
                 pass
 
+    def test_nested(self):
+        l1 = build_lock()
+        process = OtherProcess(build_lock(shared=True))
+        with l1:
+            with build_lock():
+                pass
+            # the inner lock left the target locked by the outer one
+            self.assertFile(l1.target)
+            process.start()
+            process.join()
+        self.assertIsInstance(process.queue.get(), ProcessLockError)
+        self.assertPathDoesNotExist(l1.target)
+
+    def test_nested_exclusive(self):
+        l1 = build_lock(shared=True)
+        process = OtherProcess(build_lock(shared=True))
+        with l1:
+            with build_lock():
+                pass
+            process.start()
+            process.join()
+        self.assertIsInstance(process.queue.get(), ProcessLockError)
+        self.assertPathDoesNotExist(l1.target)
+
     def test_another_process(self):
         l1 = build_lock()
         process = OtherProcess(l1)
@@ -116,6 +140,25 @@ class ProcessLockTest(tests.support.TestCase):
         self.assertEqual(process.queue.empty(), True)
         self.assertPathDoesNotExist(target)
 
+    def test_shared(self):
+        l1 = build_lock(shared=True)
+        process = OtherProcess(build_lock(shared=True))
+        with l1:
+            process.start()
+            process.join()
+        self.assertEqual(process.queue.empty(), True)
+        self.assertPathDoesNotExist(l1.target)
+
+    def test_shared_exclusive(self):
+        l1 = build_lock(shared=True)
+        process = OtherProcess(build_lock())
+        with l1:
+            process.start()
+            process.join()
+        err = process.queue.get()
+        self.assertIsInstance(err, ProcessLockError)
+        self.assertIsNone(err.pid)
+
     def test_another_thread(self):
         l1 = build_lock()
         thread = OtherThread(l1)
@@ -113,6 +113,22 @@ class MatchCounterTest(support.TestCase):
         counter.add(pkg2, 'summary', 'clock')
         self.assertSequenceEqual(counter.sorted(), (pkg2, pkg1))
 
+    @mock.patch('dnf.match_counter.MatchCounter._eval_weight', return_value=1)
+    def test_sort_data_evaluated_once(self, eval_weight):
+        counter = dnf.match_counter.MatchCounter()
+        pkg1, pkg2 = PackageStub().several(2)
+        counter.add(pkg1, 'summary', 'sum')
+        counter.add(pkg1, 'name', 'nevra', 5)
+        counter.add(pkg2, 'summary', 'sum')
+        counter.sorted()
+        counter.sorted(reverse=True, limit_to=[pkg2])
+        counter.matched_needles(pkg1)
+        self.assertEqual(eval_weight.call_count, 3)
+
+        counter.add(pkg2, 'name', 'nevra')
+        self.assertCountEqual(counter.matched_needles(pkg2), ['sum', 'nevra'])
+        self.assertEqual(eval_weight.call_count, 5)
+
     def test_total(self):
         counter = dnf.match_counter.MatchCounter()
         counter.add(3, 'summary', 'humbert')
@@ -0,0 +1,61 @@
+# Copyright (C) 2017 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from tests import support
+from tests.support import mock
+
+import dnf.rpm.miscutils
+
+
+class SigCheckerTest(support.TestCase):
+    def setUp(self):
+        self.checked = []
+
+    def check_sig(self, ts, package):
+        self.checked.append(package)
+        if package == 'broken':
+            raise OSError('no such file')
+        return len(package)
+
+    @mock.patch('dnf.rpm.transaction.initReadOnlyTransaction')
+    def test_threads(self, init_ts):
+        checker = dnf.rpm.miscutils._SigChecker('/', ['a', 'bb', 'broken'], 2)
+        with mock.patch('dnf.rpm.miscutils.checkSig', self.check_sig):
+            try:
+                checker.submit('bb')
+                self.assertEqual(checker.result('bb'), 2)
+                self.assertEqual(checker.result('a'), 1)
+                self.assertRaises(OSError, checker.result, 'broken')
+                # not given to the checker, checked right away
+                self.assertEqual(checker.result('ccc'), 3)
+            finally:
+                checker.close()
+        self.assertCountEqual(self.checked, ['a', 'bb', 'broken', 'ccc'])
+        self.assertLessEqual(len(init_ts.mock_calls), 3)
+
+    @mock.patch('dnf.rpm.transaction.initReadOnlyTransaction')
+    def test_one_job(self, init_ts):
+        checker = dnf.rpm.miscutils._SigChecker('/', ['a', 'bb'])
+        with mock.patch('dnf.rpm.miscutils.checkSig', self.check_sig):
+            checker.submit('a')
+            self.assertEqual(self.checked, [])
+            self.assertEqual(checker.result('bb'), 2)
+            self.assertEqual(checker.result('a'), 1)
+        checker.close()
+        self.assertEqual(len(init_ts.mock_calls), 1)
@@ -17,10 +17,13 @@
 
 from __future__ import absolute_import
 from __future__ import unicode_literals
+from tests.support import mock
 
 import dnf.comps
 import dnf.persistor
 import dnf.pycomp
+import dnf.yum.misc
+import os
 import tempfile
 import tests.support
 
@@ -62,6 +65,41 @@ class GroupPersistorTest(tests.support.TestCase):
         prst._prune_db()
         self.assertLength(prst.db['GROUPS'], 1)
 
+    def test_groups_listing(self):
+        prst = self.prst
+        grp = prst.group('pepper')
+        grp.full_list.extend(['pepper', 'tour'])
+        prst.group('kite').full_list.append('tour')
+        self.assertEqual(prst._groups_listing('tour'), {'pepper': 1, 'kite': 1})
+        del grp.full_list[:]
+        self.assertEqual(prst._groups_listing('tour'), {'kite': 1})
+        self.assertEqual(prst._groups_listing('pepper'), {})
+        prst.db = prst._empty_db()
+        self.assertEqual(prst._groups_listing('tour'), {})
+
+    def test_groups_listing_replaced(self):
+        prst = self.prst
+        prst.group('pepper').full_list.append('tour')
+        self.assertEqual(prst._groups_listing('tour'), {'pepper': 1})
+        # a delete and an add keep the number of groups
+        del prst.db['GROUPS']['pepper']
+        prst.db['GROUPS']['kite'] = {'full_list': ['tour', 'tour']}
+        self.assertEqual(prst._groups_listing('tour'), {'kite': 2})
+
+    def test_group_remove_diff(self):
+        prst = self.prst
+        grp = prst.group('pepper')
+        grp.full_list.extend(['pepper', 'tour'])
+        grp.pkg_types = dnf.comps.DEFAULT
+        prst.commit()
+        self.assertTrue(prst.save())
+
+        prst = dnf.persistor.GroupPersistor(self.persistdir)
+        solver = dnf.comps.Solver(prst, None, lambda pkg_name: 'group')
+        trans = solver._group_remove('pepper')
+        self.assertCountEqual(trans.remove, ('pepper', 'tour'))
+        self.assertCountEqual(prst.diff().removed_groups, ('pepper',))
+
     def test_saving(self):
         prst = self.prst
         grp = prst.group('pepper')
@@ -75,6 +113,21 @@ class GroupPersistorTest(tests.support.TestCase):
         self.assertEqual(grp.full_list, ['pepper', 'tour'])
         self.assertEqual(grp.pkg_types, dnf.comps.DEFAULT | dnf.comps.OPTIONAL)
 
+    def test_saving_rollback(self):
+        prst = self.prst
+        prst.group('pepper').pkg_types = dnf.comps.DEFAULT
+        prst.commit()
+        self.assertTrue(prst.save())
+        self.assertEqual(os.listdir(self.persistdir), ['groups.json'])
+
+        prst = dnf.persistor.GroupPersistor(self.persistdir)
+        prst.group('pepper').full_list.append('tour')
+        prst.group('kite').pkg_types = dnf.comps.DEFAULT
+        self.assertIn('kite', prst.diff().new_groups)
+        prst._rollback()
+        self.assertCountEqual(prst.groups, ('pepper',))
+        self.assertEmpty(prst.group('pepper').full_list)
+
     def test_version(self):
         version = self.prst.db['meta']['version']
         self.assertIsInstance(version, dnf.pycomp.unicode)
@@ -124,3 +177,57 @@ class RepoPersistorTest(tests.support.TestCase):
 
         prst = dnf.persistor.RepoPersistor(self.persistdir)
         self.assertEqual(prst.get_expired_repos(), IDS)
+
+
+class RpmdbVersionPersistorTest(tests.support.TestCase):
+    def setUp(self):
+        self.persistdir = tempfile.mkdtemp(prefix="dnf-rpmdbvprst-test-")
+        self.prst = dnf.persistor.RpmdbVersionPersistor(self.persistdir)
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.persistdir)
+
+    def test_version(self):
+        key = [[['Packages', 1474985287.5, 9097216, 42]], 3, 1057]
+        self.assertIsNone(self.prst.get(key))
+        self.prst.save(key, '1057:4ab2f1d3')
+
+        prst = dnf.persistor.RpmdbVersionPersistor(self.persistdir)
+        self.assertEqual(prst.get(key), '1057:4ab2f1d3')
+        key[1] = 4
+        self.assertIsNone(prst.get(key))
+
+
+class ChecksumPersistorTest(tests.support.TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(prefix="dnf-chksumprst-test-")
+        self.prst = dnf.persistor.ChecksumPersistor(self.cachedir)
+        self.path = os.path.join(self.cachedir, 'pepper.rpm')
+        with open(self.path, 'w') as f:
+            f.write('pepper')
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.cachedir)
+
+    def test_checksum(self):
+        real_sum = dnf.yum.misc.checksum('sha256', self.path)
+        with mock.patch('dnf.yum.misc.checksum',
+                        wraps=dnf.yum.misc.checksum) as checksum:
+            self.assertEqual(self.prst.checksum('sha256', self.path), real_sum)
+            hashed = len(checksum.mock_calls)
+            self.prst.save()
+            prst = dnf.persistor.ChecksumPersistor(self.cachedir)
+            self.assertEqual(prst.checksum('sha256', self.path), real_sum)
+            self.assertLength(checksum.mock_calls, hashed)
+
+            with open(self.path, 'a') as f:
+                f.write('tour')
+            self.assertNotEqual(prst.checksum('sha256', self.path), real_sum)
+            self.assertLength(checksum.mock_calls, 2 * hashed)
+
+    def test_save_forgets_removed(self):
+        self.prst.checksum('sha256', self.path)
+        os.unlink(self.path)
+        self.prst.save()
+        prst = dnf.persistor.ChecksumPersistor(self.cachedir)
+        self.assertEqual(prst._checksums, {})
@@ -453,6 +453,76 @@ class LocalRepoTest(support.TestCase):
             self.assertRaises(dnf.exceptions.RepoError, self.repo.load)
 
 
+class SyncReposTest(RepoTestMixin, support.TestCase):
+    def setUp(self):
+        self.repos = [self.build_repo('r'), self.build_repo('s')]
+
+    def tearDown(self):
+        for repo in self.repos:
+            dnf.util.rm_rf(repo._cachedir)
+
+    def test_sync(self):
+        progress = mock.Mock()
+        for repo in self.repos:
+            repo.set_progress_bar(progress)
+        self.assertEqual(dnf.repo._sync_repos(self.repos, 2), {})
+        for repo in self.repos:
+            self.assertTrue(repo.metadata.fresh)
+            self.assertFalse(repo.load())
+        progress.start.assert_called_once_with(2, 1)
+        self.assertEqual(progress.end.call_count, 2)
+
+    def test_sync_error(self):
+        self.repos[1].baseurl = []
+        errors = dnf.repo._sync_repos(self.repos, 2)
+        self.assertEqual(list(errors), ['s'])
+        self.assertIsInstance(errors['s'], dnf.exceptions.RepoError)
+        self.assertIsNotNone(self.repos[0].metadata)
+
+    def test_revive(self):
+        for repo in self.repos:
+            repo.load()
+            repo._md_expire_cache()
+        with mock.patch.object(dnf.repo.Repo, '_try_revive', autospec=True,
+                               side_effect=lambda repo: repo.id == 'r'):
+            dnf.repo._revive_repos(self.repos, 2)
+        (revived, rejected) = self.repos
+        self.assertFalse(revived._expired)
+        self.assertFalse(revived._revive_rejected)
+        self.assertTrue(rejected._expired)
+        self.assertTrue(rejected._revive_rejected)
+
+        # the rejected repo downloads without checking again:
+        with mock.patch.object(dnf.repo.Repo, '_try_revive') as try_revive:
+            self.assertTrue(rejected.load())
+        self.assertFalse(try_revive.called)
+        self.assertTrue(rejected.metadata.fresh)
+
+    def test_sync_interrupted(self):
+        def interrupt(fn, items, jobs):
+            if items:
+                raise KeyboardInterrupt()
+            return []
+
+        with mock.patch('dnf.util._concurrent_map', side_effect=interrupt), \
+             mock.patch.object(dnf.repo.Repo, '_cache_usable',
+                               return_value=False), \
+             mock.patch.object(dnf.repo._SyncProgress, '_abort') as abort:
+            self.assertRaises(KeyboardInterrupt, dnf.repo._sync_repos,
+                              self.repos, 2)
+        self.assertTrue(abort.called)
+
+        sync_progress = dnf.repo._SyncProgress(mock.Mock())
+        sync_progress._abort()
+        self.assertRaises(dnf.exceptions.RepoError, sync_progress.progress,
+                          mock.Mock(), 0)
+
+    def test_sync_serial(self):
+        self.assertEqual(dnf.repo._sync_repos(self.repos, 1), {})
+        for repo in self.repos:
+            self.assertIsNone(repo.metadata)
+
+
 class DownloadPayloadsTest(RepoTestMixin, support.TestCase):
 
     def test_drpm_error(self):
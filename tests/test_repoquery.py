@@ -129,6 +129,78 @@ class OutputTest(unittest.TestCase):
         self.assertEqual(str(ctx.exception),
                          "'PkgStub' object has no attribute 'notfound'")
 
+    def test_print_unsorted(self):
+        with support.patch_std_streams() as (stdout, _):
+            dnf.cli.commands.repoquery.RepoQueryCommand._print_unsorted(
+                iter(['pepper', 'lotus', 'pepper', 'hole']))
+        self.assertEqual(stdout.getvalue(), 'pepper\nlotus\nhole\n')
+
+
+class ByAllDepsTest(unittest.TestCase):
+    def test_single_requires_filter(self):
+        cmd = dnf.cli.commands.repoquery.RepoQueryCommand(
+            support.CliStub(support.BaseCliStub()))
+        glibc = support.mock.Mock(provides=['libc.so.6', 'glibc'])
+        query = support.mock.Mock()
+        query.filter.return_value.run.return_value = [glibc]
+        cmd.by_all_deps('glibc', query)
+        requires_calls = [call for call in query.filter.call_args_list
+                          if 'requires' in call[1]]
+        self.assertEqual(len(requires_calls), 1)
+        self.assertEqual(requires_calls[0][1]['requires'],
+                         ['libc.so.6', 'glibc'])
+
+
+class ProviderCacheTest(unittest.TestCase):
+    def test_lru(self):
+        cache = dnf.cli.commands.repoquery._ProviderCache(size=2)
+        resolve = support.mock.Mock(side_effect=lambda: ['pepper'])
+        self.assertEqual(cache.get('a', resolve), ['pepper'])
+        cache.get('b', resolve)
+        cache.get('a', resolve)
+        cache.get('c', resolve)  # evicts 'b'
+        cache.get('b', resolve)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        self.assertEqual(resolve.call_count, 4)
+
+
+    def test_get_many(self):
+        cache = dnf.cli.commands.repoquery._ProviderCache(size=3)
+        cache.get('a', lambda: ['pepper'])
+        resolve = support.mock.Mock(
+            side_effect=lambda keys: dict((key, [key]) for key in keys))
+        self.assertEqual(cache.get_many(['a', 'b', 'c'], resolve),
+                         {'a': ['pepper'], 'b': ['b'], 'c': ['c']})
+        resolve.assert_called_once_with(['b', 'c'])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        cache.get_many(['d'], resolve)  # evicts 'a'
+        self.assertEqual(cache.get('a', lambda: ['lotus']), ['lotus'])
+
+
+class TreeTest(unittest.TestCase):
+    def test_level_resolved_at_once(self):
+        cmd = dnf.cli.commands.repoquery.RepoQueryCommand(
+            support.CliStub(support.BaseCliStub()))
+        pepper = support.mock.Mock(requires=['libc.so.6', 'lotus'])
+        lotus = support.mock.Mock(requires=['libc.so.6'])
+        sack_query = support.mock.Mock()
+        candidates = sack_query.filter.return_value
+        candidates.filter.return_value.run.return_value = ['glibc']
+        cmd.base._sack = support.mock.Mock()
+        cmd.base._sack.query.return_value = sack_query
+        providers = cmd._tree_providers([pepper, lotus], 'requires')
+        provides_calls = [call for call in sack_query.filter.call_args_list
+                          if 'provides' in call[1]]
+        self.assertEqual(len(provides_calls), 1)
+        self.assertCountEqual(provides_calls[0][1]['provides'],
+                              ['libc.so.6', 'lotus'])
+        self.assertEqual(len(providers[pepper]), 2)
+        self.assertEqual(len(providers[lotus]), 1)
+
+        # the reldeps are cached one by one:
+        cmd._tree_providers([lotus], 'requires')
+        self.assertEqual(sack_query.filter.call_count, 1)
+
 
 class Rpm2PyFormatTest(unittest.TestCase):
     def test_rpm2py_format(self):
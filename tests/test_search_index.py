@@ -0,0 +1,111 @@
+# Copyright (C) 2016 Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from tests import support
+from tests.support import mock
+
+import dnf.search_index
+import dnf.util
+import os
+import tempfile
+
+
+def _package(nevra, summary, description='', url=''):
+    pkg = support.MockPackage(nevra)
+    pkg.summary = summary
+    pkg.description = description
+    pkg.url = url
+    return pkg
+
+
+class RepoIndexTest(support.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix='dnf-searchindextest-')
+        self.fn = os.path.join(self.path, 'main.search')
+        self.pkgs = [
+            _package('lotus-3-16.x86_64', 'Lotus flower', 'A water plant.'),
+            _package('pepper-20-0.x86_64', 'Hot pepper',
+                     'Spicy, not a lotus.', 'http://pepper.org'),
+        ]
+        dnf.search_index._RepoIndex.build(self.fn, 'key1', self.pkgs)
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.path)
+
+    def test_stale(self):
+        self.assertIsNone(
+            dnf.search_index._RepoIndex.open(self.fn, 'main', 'key2'))
+
+    def test_search(self):
+        index = dnf.search_index._RepoIndex.open(self.fn, 'main', 'key1')
+        hits = index.search(('name', 'summary'), ['LOT', 'pepper'])
+        self.assertEqual(hits, {0: set([('name', 'LOT'), ('summary', 'LOT')]),
+                                1: set([('name', 'pepper'),
+                                        ('summary', 'pepper')])})
+
+        hits = index.search(('description', 'url'), ['lotus', 'pepper'])
+        self.assertEqual(hits, {1: set([('description', 'lotus'),
+                                        ('url', 'pepper')])})
+        rows = index.packages([1])
+        self.assertEqual(rows[1][:2], ('pepper-20-0.x86_64', 'pepper'))
+        self.assertEqual(rows[1][2]['url'], len('http://pepper.org'))
+        index.close()
+
+    def test_build_twice(self):
+        dnf.search_index._RepoIndex.build(self.fn, 'key2', self.pkgs[:1])
+        self.assertEqual(os.listdir(self.path), ['main.search'])
+        index = dnf.search_index._RepoIndex.open(self.fn, 'main', 'key2')
+        self.assertEqual(index.search(('name',), ['pepper']), {})
+        index.close()
+
+    def test_excluded(self):
+        index = dnf.search_index._RepoIndex.open(self.fn, 'main', 'key1')
+        base = mock.Mock()
+        # pepper is excluded from the sack the search runs in:
+        base.sack.query().filter.return_value = self.pkgs[:1]
+        base.repos.iter_enabled.return_value = []
+        sack_index = dnf.search_index.SackIndex(base)
+        sack_index._indexes = [index]
+        hits = list(sack_index.search(('name', 'summary'),
+                                      ['lotus', 'pepper']))
+        self.assertCountEqual(hits, [(self.pkgs[0], 'name', 'lotus', 5),
+                                     (self.pkgs[0], 'summary', 'lotus', 12)])
+        sack_index.close()
+
+    def test_key(self):
+        repomd_fn = os.path.join(self.path, 'repomd.xml')
+        with open(repomd_fn, 'w') as repomd:
+            repomd.write('<repomd/>')
+        repo = mock.Mock(_repomd_fn=repomd_fn, id='main', includepkgs=[],
+                         excludepkgs=[])
+        base = mock.Mock()
+        base.conf.disable_excludes = []
+        base.conf.includepkgs = []
+        base.conf.excludepkgs = ['pepper']
+        base.sack.query().filter.return_value = self.pkgs
+        key = dnf.search_index._index_key(base, repo)
+        self.assertEqual(key, dnf.search_index._index_key(base, repo))
+        # a plugin excluded more packages of the repo:
+        base.sack.query().filter.return_value = self.pkgs[:1]
+        self.assertNotEqual(key, dnf.search_index._index_key(base, repo))
+
+    def test_indexable(self):
+        self.assertTrue(dnf.search_index.indexable('lotus'))
+        self.assertFalse(dnf.search_index.indexable('lot*'))
+        self.assertFalse(dnf.search_index.indexable('water plant'))
@@ -22,6 +22,7 @@ from tests.support import mock, FakeConf
 import dnf.goal
 import dnf.repo
 import dnf.transaction
+import dnf.yum.rpmtrans
 import rpm
 import tests.support
 
@@ -162,6 +163,45 @@ class TransactionTest(tests.support.TestCase):
     def test_total_package_count(self):
         self.assertEqual(self.trans._total_package_count(), 11)
 
+class RPMTransactionTest(tests.support.TestCase):
+    @mock.patch('dnf.yum.rpmtrans.RPMTransaction._setupOutputLogging')
+    def test_extract_cbkey(self, _setup):
+        ipkg = tests.support.MockPackage('inst-1.0-1.x86_64')
+        upkg = tests.support.MockPackage('upg-2.1-2.x86_64')
+        rpkg = tests.support.MockPackage('rem-2.1-1.x86_64')
+        opkg = tests.support.MockPackage('obs-4.23-13.x86_64')
+        base = mock.Mock()
+        base.transaction = dnf.transaction.Transaction()
+        base.transaction.add_install(ipkg, [opkg])
+        base.transaction.add_upgrade(upkg, rpkg, [])
+        cb = dnf.yum.rpmtrans.RPMTransaction(base)
+        cb._te_list = [mock.Mock(NEVRA=mock.Mock(return_value=nevra))
+                       for nevra in ('rem-2.1-1.x86_64', 'obs-4.23-13.x86_64',
+                                     'gone-1-1.noarch')]
+        (ins_tsi, upg_tsi) = base.transaction
+
+        cb._elemProgress(0)
+        self.assertEqual(cb._extract_cbkey(None), (rpkg, 'Updated', upg_tsi))
+        cb._elemProgress(1)
+        self.assertEqual(cb._extract_cbkey(None), (opkg, 'Obsoleted', ins_tsi))
+        cb._elemProgress(2)
+        self.assertEqual(cb._extract_cbkey(None), (None, None, None))
+        self.assertEqual(cb._extract_cbkey(upg_tsi), (upkg, 'Update', upg_tsi))
+
+    @mock.patch('dnf.yum.rpmtrans.RPMTransaction._setupOutputLogging')
+    def test_journal(self, _setup):
+        base = mock.Mock()
+        cb = dnf.yum.rpmtrans.RPMTransaction(base)
+        cb._journal_time = float('inf')
+        for _ in range(dnf.yum.rpmtrans.JOURNAL_BATCH - 1):
+            cb._journal()
+        self.assertEqual(base.history.commit.call_count, 0)
+        cb._journal()
+        self.assertEqual(base.history.commit.call_count, 1)
+        cb._journal()
+        cb.close()
+        self.assertEqual(base.history.commit.call_count, 2)
+
 class RPMLimitationsTest(tests.support.TestCase):
     def test_rpm_limitations(self):
         ts = dnf.transaction.Transaction()
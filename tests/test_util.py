@@ -21,6 +21,7 @@ from tests import support
 from tests.support import mock
 import dnf.util
 import operator
+import threading
 
 class Slow(object):
     def __init__(self, val):
@@ -154,6 +155,41 @@ class Util(support.TestCase):
         self.assertEqual(slow.square2, 169)
         self.assertEqual(slow.computed, 4)
 
+    def test_concurrent_map(self):
+        def halve(n):
+            if n % 2:
+                raise ValueError(n)
+            return n // 2
+
+        out = dnf.util._concurrent_map(halve, [4, 3, 8], 2)
+        self.assertEqual([res for (res, _) in out], [2, None, 4])
+        self.assertIsNone(out[0][1])
+        self.assertIsInstance(out[1][1], ValueError)
+
+    def test_concurrent_map_interrupted(self):
+        started = threading.Event()
+        go = threading.Event()
+        calls = []
+        workers = []
+
+        def wait(n):
+            calls.append(n)
+            workers.append(threading.current_thread())
+            started.set()
+            go.wait()
+
+        def interrupt(timeout=None):
+            started.wait()
+            raise KeyboardInterrupt()
+
+        with mock.patch.object(threading.Thread, 'join',
+                               side_effect=interrupt):
+            self.assertRaises(KeyboardInterrupt, dnf.util._concurrent_map,
+                              wait, [1, 2, 3], 1)
+        go.set()
+        workers[0].join()
+        self.assertEqual(calls, [1])
+
     def test_mapall(self):
         l = [1, 2, 3]
         out = dnf.util.mapall(lambda n: 2 * n, l)
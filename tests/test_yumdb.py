@@ -20,7 +20,11 @@ from __future__ import unicode_literals
 from tests import support
 from tests.support import mock
 
+import dnf.util
 import dnf.yum.rpmsack
+import os
+import sqlite3
+import tempfile
 import unittest
 
 
@@ -43,3 +47,102 @@ class TestAdditionalPkgDB(unittest.TestCase):
         directory = pkgdb._get_dir_name(pkg.pkgtup, None)
         self.assertEqual('%s/yumdb/p/<nopkgid>-pepper-20-0-x86_64' %
                          base.conf.persistdir, directory)
+
+
+class TestYumdbIndex(unittest.TestCase):
+    PKGTUP = ('pepper', 'x86_64', '0', '20', '0')
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix='dnf-yumdbtest-')
+
+    def tearDown(self):
+        dnf.util.rm_rf(self.path)
+
+    def _write_tree(self, attr, value):
+        pkgdir = os.path.join(self.path, 'p', 'bad9-pepper-20-0-x86_64')
+        if not os.path.exists(pkgdir):
+            os.makedirs(pkgdir)
+        with open(os.path.join(pkgdir, attr + '.tmp'), 'w') as f:
+            f.write(value)
+        os.rename(os.path.join(pkgdir, attr + '.tmp'),
+                  os.path.join(pkgdir, attr))
+        # do not depend on the timestamp granularity of the filesystem:
+        os.utime(pkgdir, (0, os.stat(pkgdir).st_mtime - 10))
+        return pkgdir
+
+    def test_migrate(self):
+        self._write_tree('reason', 'user')
+
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        self.assertIsNotNone(pkgdb._index)
+        with mock.patch('dnf.yum.rpmsack._iopen') as iopen:
+            ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+            self.assertEqual(ydbi.reason, 'user')
+            self.assertEqual(list(ydbi), ['reason'])
+        iopen.assert_not_called()
+
+    def test_tree_changed(self):
+        pkgdir = self._write_tree('reason', 'user')
+        dnf.yum.rpmsack.AdditionalPkgDB(self.path).close()
+
+        # written by another tool behind the index:
+        self._write_tree('from_repo', 'main')
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+        self.assertEqual(ydbi.from_repo, 'main')
+        self.assertCountEqual(list(ydbi), ['from_repo', 'reason'])
+        pkgdb.close()
+
+        dnf.util.rm_rf(pkgdir)
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+        self.assertIsNone(ydbi.get('reason'))
+
+    def test_index_miss(self):
+        self._write_tree('reason', 'user')
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        # a row lost from the index while the tree is unchanged:
+        pkgdb._index._conn.execute("DELETE FROM attrs")
+        pkgdb._index._conn.commit()
+        ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+        self.assertEqual(ydbi.reason, 'user')
+
+    def test_write(self):
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+        ydbi.from_repo = 'main'
+        ydbi.reason = 'dep'
+        del ydbi.reason
+        # the tree is still written:
+        self.assertTrue(os.path.exists(ydbi._attr2fn('from_repo')))
+        pkgdb.close()
+
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        pkg = support.MockPackage('pepper-20-0.x86_64')
+        pkg._pkgid = 'bad9'
+        ydbi = pkgdb.get_many([pkg])[pkg]
+        self.assertEqual(ydbi.get('from_repo'), 'main')
+        self.assertNotIn('reason', ydbi)
+
+        ydbi.clean()
+        ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+        self.assertIsNone(ydbi.get('from_repo'))
+
+    def test_batch(self):
+        pkgdb = dnf.yum.rpmsack.AdditionalPkgDB(self.path)
+        index_file = os.path.join(self.path, dnf.yum.rpmsack._INDEX_FILENAME)
+        reader = sqlite3.connect(index_file)
+        count = 'SELECT COUNT(*) FROM attrs'
+        with pkgdb.batch():
+            ydbi = pkgdb.get_package(pkgtup=self.PKGTUP, pkgid='bad9')
+            ydbi.from_repo = 'main'
+            ydbi.reason = 'dep'
+            ydbi.reason = 'user'
+            self.assertEqual(ydbi.reason, 'user')
+            self.assertEqual(reader.execute(count).fetchone(), (0,))
+            self.assertFalse(os.path.exists(ydbi._mydir))
+        self.assertEqual(reader.execute(count).fetchone(), (2,))
+        reader.close()
+        self.assertCountEqual(os.listdir(ydbi._mydir), ['from_repo', 'reason'])
+        with open(ydbi._attr2fn('reason')) as f:
+            self.assertEqual(f.read(), 'user')